@@ -0,0 +1,112 @@
+"""
+Memory per file of the file inventory, duplicate search and read ordering.
+
+Builds a throwaway tree of empty files, scans it into a FileInventory, then
+runs duplicate_groups and read_order under tracemalloc and checks the bytes
+per file against the ceilings documented in docs/README.md:
+
+    PYTHONPATH=src python benchmarks/bench_inventory_memory.py --files 200000
+
+Exits with status 1 if any figure is over its ceiling.
+"""
+
+import argparse
+import hashlib
+import logging
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from pypixpro.core.common import scan_inventory
+from pypixpro.core.io_order import read_order
+
+logger = logging.getLogger(__name__)
+
+# Ceilings in bytes per file, for the 23-byte names below; keep in sync
+# with "Large Libraries" in docs/README.md
+MAX_INVENTORY_BYTES = 75
+MAX_DUPLICATE_SEARCH_BYTES = 8
+MAX_READ_ORDER_BYTES = 24
+
+# Below this, fixed interpreter overheads (dict tables of about 1-2 MB)
+# dominate and the per-file figures stop meaning much
+MIN_FILES = 200_000
+
+FILES_PER_FOLDER = 1000
+DUPLICATE_EVERY = 10
+
+
+def build_tree(root_folder, file_count):
+    """Create file_count empty files with 23-byte camera-style names."""
+    for number in range(file_count):
+        folder = root_folder / f"{number // FILES_PER_FOLDER:05d}"
+        if number % FILES_PER_FOLDER == 0:
+            folder.mkdir()
+        (folder / f"IMG_{number:07d}_202406.HEIC").touch()
+
+
+def fill_digests(inventory):
+    """Give every file a digest; one in DUPLICATE_EVERY repeats the one before."""
+    for index in range(len(inventory)):
+        content = index - 1 if index % DUPLICATE_EVERY == 1 else index
+        digest = hashlib.blake2b(content.to_bytes(8, "big"), digest_size=32)
+        inventory.set_digest(index, digest.digest())
+
+
+def measure(label, file_count, ceiling, step):
+    """Run step under tracemalloc and check its peak bytes per file."""
+    tracemalloc.start()
+    try:
+        result = step()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    per_file = peak / file_count
+    within = per_file <= ceiling
+    logger.info(
+        f"{'✅' if within else '❌'} {label}: {peak / (1 << 20):.1f} MB peak, "
+        f"{per_file:.1f} bytes/file (ceiling {ceiling})"
+    )
+    return result, within
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=MIN_FILES)
+    args = parser.parse_args(argv)
+    if args.files < MIN_FILES:
+        parser.error(f"--files must be at least {MIN_FILES}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        root_folder = Path(temp_folder)
+        logger.info(f"📂 Creating {args.files} files in {root_folder}...")
+        build_tree(root_folder, args.files)
+
+        inventory, inventory_ok = measure(
+            "Inventory",
+            args.files,
+            MAX_INVENTORY_BYTES,
+            lambda: scan_inventory(root_folder),
+        )
+        fill_digests(inventory)
+        groups, duplicates_ok = measure(
+            "Duplicate search",
+            args.files,
+            MAX_DUPLICATE_SEARCH_BYTES,
+            lambda: sum(1 for _ in inventory.duplicate_groups()),
+        )
+        _, read_order_ok = measure(
+            "Read order",
+            args.files,
+            MAX_READ_ORDER_BYTES,
+            lambda: read_order(inventory),
+        )
+
+    logger.info(f"📋 {groups} duplicate groups among {len(inventory)} files")
+    return 0 if inventory_ok and duplicates_ok and read_order_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Cold-cache hashing throughput in directory order vs. on-disk order.
+
+Run against a folder on the disk you care about, ideally a spinning one:
+
+    PYTHONPATH=src python benchmarks/bench_io_order.py /Volumes/Archive/Photos
+
+The page cache is dropped with POSIX_FADV_DONTNEED before each pass, so no
+root access is needed on Linux. macOS has no posix_fadvise; run `sudo purge`
+between separate invocations there instead.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from pypixpro.core.common import hash_file, scan_inventory
+from pypixpro.core.io_order import read_order
+
+logger = logging.getLogger(__name__)
+
+
+def drop_cached(inventory):
+    """Evict every file of the inventory from the page cache."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in inventory.paths():
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def timed_hash(inventory, indices):
+    """Hash the given files in order; return (bytes read, seconds)."""
+    total_bytes = 0
+    start = time.perf_counter()
+    for index in indices:
+        path = inventory.path(index)
+        try:
+            hash_file(path)
+            total_bytes += path.stat().st_size
+        except OSError as e:
+            logger.error(f"❌ Error hashing {path}: {e}")
+    return total_bytes, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument(
+        "--inodes", action="store_true", help="order by inode, not by extent"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not hasattr(os, "posix_fadvise"):
+        logger.warning(
+            "⚠️ posix_fadvise is unavailable; the page cache is not dropped "
+            "between passes, so the second pass may read from memory."
+        )
+
+    # Flush pending writes so FIEMAP reports real extents
+    os.sync()
+    inventory = scan_inventory(Path(args.root).resolve())
+    start = time.perf_counter()
+    disk_order = read_order(inventory, use_extents=not args.inodes)
+    logger.info(
+        f"📋 {len(inventory)} files ordered in {time.perf_counter() - start:.2f}s"
+    )
+
+    for label, indices in (
+        ("directory order", range(len(inventory))),
+        ("disk order", disk_order),
+    ):
+        drop_cached(inventory)
+        total_bytes, elapsed = timed_hash(inventory, indices)
+        rate = total_bytes / (1 << 20) / elapsed if elapsed else 0.0
+        logger.info(f"⏱️ {label}: {elapsed:.2f}s, {rate:.1f} MB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
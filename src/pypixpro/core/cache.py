@@ -0,0 +1,131 @@
+import json
+import sqlite3
+
+CACHE_DIR_NAME = ".pypixpro"
+CACHE_FILE_NAME = "cache.sqlite3"
+
+# Writes are committed in batches so a crash loses at most this many entries
+COMMIT_INTERVAL = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    digest BLOB PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class LibraryCache:
+    """
+    Content hashes and header metadata for one library folder.
+
+    Hashes are keyed by path relative to the library and only trusted while
+    the file's size and mtime are unchanged. Metadata is keyed by content
+    hash, so it survives moves, renames and re-layouts of the same file.
+    The cache lives in a hidden folder inside the library itself, along
+    with the run_state table used to checkpoint and resume runs.
+    """
+
+    def __init__(self, root_folder):
+        self.root_folder = root_folder
+        cache_dir = root_folder / CACHE_DIR_NAME
+        cache_dir.mkdir(exist_ok=True)
+        self.connection = sqlite3.connect(str(cache_dir / CACHE_FILE_NAME))
+        self.connection.executescript(SCHEMA)
+        self.pending_writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _key(self, path):
+        return path.relative_to(self.root_folder).as_posix()
+
+    def _write(self, sql, params):
+        self.connection.execute(sql, params)
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.commit()
+
+    def lookup_digest(self, path, stat_result):
+        """Return the cached digest for path if the file is unchanged."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest FROM hashes WHERE path = ?",
+            (self._key(path),),
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, digest = row
+        if size != stat_result.st_size or mtime_ns != stat_result.st_mtime_ns:
+            return None
+        return digest
+
+    def record_digest(self, path, stat_result, digest):
+        """Remember the digest of path at its current size and mtime."""
+        self._write(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+            (self._key(path), stat_result.st_size, stat_result.st_mtime_ns, digest),
+        )
+
+    def move(self, old_path, new_path):
+        """Carry a file's cached digest over to its new path."""
+        self._write(
+            "UPDATE OR REPLACE hashes SET path = ? WHERE path = ?",
+            (self._key(new_path), self._key(old_path)),
+        )
+
+    def forget(self, path):
+        """Drop the cached digest of a deleted file."""
+        self._write("DELETE FROM hashes WHERE path = ?", (self._key(path),))
+
+    def get_metadata(self, digest):
+        """Return the cached header metadata for a content hash, or None."""
+        row = self.connection.execute(
+            "SELECT data FROM metadata WHERE digest = ?", (digest,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_metadata(self, digest, metadata):
+        """Store header metadata under a content hash."""
+        self._write(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+            (digest, json.dumps(metadata)),
+        )
+
+    def get_state(self, key):
+        """Return a value saved with set_state, or None."""
+        row = self.connection.execute(
+            "SELECT value FROM run_state WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_state(self, key, value):
+        """Save a JSON-serialisable run value and commit it immediately."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO run_state VALUES (?, ?)", (key, json.dumps(value))
+        )
+        self.commit()
+
+    def clear_state(self):
+        self.connection.execute("DELETE FROM run_state")
+        self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
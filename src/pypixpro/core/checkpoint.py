@@ -0,0 +1,73 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# run_processing stages, in order
+STAGE_BACKUP = "backup"
+STAGE_COUNT = "count"
+STAGE_DEDUPE = "dedupe"
+STAGE_SORT = "sort"
+STAGE_RENAME = "rename"
+STAGE_CLEAN = "clean"
+
+STATUS_RUNNING = "running"
+
+
+class RunCheckpoint:
+    """
+    Stage-level progress of a run, kept in the library cache.
+
+    Finished stages and their results are saved as soon as each stage
+    completes. Progress inside a stage is covered by the cache itself:
+    hashes and moves are committed in batches, and every stage skips files
+    that are already done. A run started with the same settings as an
+    interrupted one picks up at the first unfinished stage. Without a
+    cache every method is a no-op and nothing is resumed.
+    """
+
+    def __init__(self, cache, settings):
+        self.cache = cache
+        self.resumed = False
+        if cache is None:
+            return
+
+        if cache.get_state("status") == STATUS_RUNNING:
+            if cache.get_state("settings") == settings:
+                self.resumed = True
+                done = ", ".join(cache.get_state("stages") or []) or "none"
+                logger.info(f"♻️ Resuming interrupted run (finished stages: {done})")
+                return
+            logger.warning(
+                "⚠️ The previous run was interrupted with different settings; "
+                "starting over."
+            )
+
+        cache.clear_state()
+        cache.set_state("settings", settings)
+        cache.set_state("stages", [])
+        cache.set_state("status", STATUS_RUNNING)
+
+    def is_done(self, stage):
+        if self.cache is None:
+            return False
+        return stage in (self.cache.get_state("stages") or [])
+
+    def mark_done(self, stage, **results):
+        """Record a finished stage together with any results to carry over."""
+        if self.cache is None:
+            return
+        # Results go in first so a finished stage always has them
+        for key, value in results.items():
+            self.cache.set_state(key, value)
+        stages = self.cache.get_state("stages") or []
+        self.cache.set_state("stages", stages + [stage])
+
+    def result(self, key, default=None):
+        if self.cache is None:
+            return default
+        value = self.cache.get_state(key)
+        return default if value is None else value
+
+    def finish(self):
+        if self.cache is not None:
+            self.cache.clear_state()
@@ -0,0 +1,123 @@
+import logging
+import os
+from pathlib import Path
+
+import blake3
+import pillow_heif
+from PIL import Image
+
+from .cache import CACHE_DIR_NAME
+from .inventory import FileInventory
+from .io_order import advise_done, advise_sequential
+
+logger = logging.getLogger(__name__)
+
+EXCLUDE_FILES = {".ds_store", "thumbs.db", "desktop.ini"}
+
+# Files are hashed in chunks so large videos never sit in memory whole
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# --- Progress & Cancellation ---
+
+
+class ProcessingCancelled(Exception):
+    """Raised between file operations once a run has been cancelled."""
+
+
+def check_cancelled(cancel_event):
+    """Raise ProcessingCancelled if the given threading.Event has been set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise ProcessingCancelled()
+
+
+def report_progress(progress_callback, stage, done, total):
+    """Forward a stage counter update to the optional progress callback."""
+    if progress_callback is not None:
+        progress_callback(stage, done, total)
+
+
+# --- Files ---
+
+
+def is_excluded_name(name):
+    """Check if a file name should be excluded."""
+    name_lower = name.lower()
+    return name_lower in EXCLUDE_FILES or name_lower.startswith("icon")
+
+
+def iter_files(root_folder):
+    """Yield (directory, name) for every non-excluded file below root_folder."""
+    pending = [os.fspath(root_folder)]
+    while pending:
+        directory = pending.pop()
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != CACHE_DIR_NAME:
+                            subdirectories.append(entry.path)
+                    elif entry.is_file() and not is_excluded_name(entry.name):
+                        yield directory, entry.name
+        except OSError as e:
+            logger.error(f"❌ Error scanning {directory}: {e}")
+        pending.extend(sorted(subdirectories, reverse=True))
+
+
+def ensure_inside(root_folder, path):
+    """Raise ValueError unless path resolves to a place below root_folder."""
+    root_folder = Path(root_folder).resolve()
+    resolved = Path(path).resolve()
+    if resolved == root_folder or not resolved.is_relative_to(root_folder):
+        raise ValueError(f"{path} is not inside {root_folder}")
+
+
+def scan_inventory(root_folder):
+    """
+    Snapshot the non-excluded files below root_folder into a FileInventory.
+
+    Stages that move or rename files iterate over this snapshot rather than
+    a live directory walk, so they never revisit a file they just moved.
+    """
+    inventory = FileInventory(root_folder)
+    for directory, name in iter_files(root_folder):
+        inventory.add(directory, name)
+    return inventory
+
+
+def hash_file(path, cache=None):
+    """Return the raw BLAKE3 digest of a file, reusing the cache if unchanged."""
+    stat_result = path.stat()
+    if cache is not None:
+        digest = cache.lookup_digest(path, stat_result)
+        if digest is not None:
+            return digest
+
+    hasher = blake3.blake3()
+    with open(path, "rb") as f:
+        advise_sequential(f.fileno())
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+        advise_done(f.fileno())
+    digest = hasher.digest()
+    if cache is not None:
+        cache.record_digest(path, stat_result, digest)
+    return digest
+
+
+def decode_heic(path):
+    """
+    Decode a HEIC image once.
+
+    Returns the Pillow image and the HEIF info dict, which carries the
+    'exif' and 'icc_profile' bytes needed to write the image back out.
+    """
+    heif_file = pillow_heif.read_heif(path)
+    image = Image.frombytes(
+        heif_file.mode,
+        heif_file.size,
+        heif_file.data,
+        "raw",
+    )
+    return image, heif_file.info
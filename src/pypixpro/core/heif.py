@@ -0,0 +1,202 @@
+import io
+import os
+import struct
+
+from PIL import Image
+
+from .isobmff import find_box, iter_boxes
+
+# The 'meta' box (item list, locations and properties) is read in one go;
+# on phone photos it is a few KB, so anything larger is treated as corrupt
+MAX_META_SIZE = 4 << 20
+
+# EXIF items are a few KB too; this bounds the one read outside 'meta'
+MAX_EXIF_SIZE = 1 << 20
+
+
+def _read_uint(f, size):
+    """Read a big-endian unsigned integer of 0, 2, 4 or 8 bytes."""
+    if size == 0:
+        return 0
+    return int.from_bytes(f.read(size), "big")
+
+
+def _read_full_box_header(f, payload_start):
+    """Seek to a FullBox and return its (version, flags)."""
+    f.seek(payload_start)
+    version_flags = _read_uint(f, 4)
+    return version_flags >> 24, version_flags & 0xFFFFFF
+
+
+def _read_primary_item(f, pitm_start):
+    version, _ = _read_full_box_header(f, pitm_start)
+    return _read_uint(f, 2 if version == 0 else 4)
+
+
+def _read_item_types(f, iinf_start, iinf_end):
+    """Return {item_id: item_type} from the 'infe' entries of 'iinf'."""
+    version, _ = _read_full_box_header(f, iinf_start)
+    entries_start = f.tell() + (2 if version == 0 else 4)
+    item_types = {}
+    for box_type, payload_start, _ in iter_boxes(f, entries_start, iinf_end):
+        if box_type != b"infe":
+            continue
+        infe_version, _ = _read_full_box_header(f, payload_start)
+        if infe_version < 2:
+            continue
+        item_id = _read_uint(f, 2 if infe_version == 2 else 4)
+        f.seek(2, os.SEEK_CUR)  # item_protection_index
+        item_types[item_id] = f.read(4)
+    return item_types
+
+
+def _read_item_locations(f, iloc_start):
+    """Return {item_id: (construction_method, [(offset, length), ...])}."""
+    version, _ = _read_full_box_header(f, iloc_start)
+    sizes = _read_uint(f, 2)
+    offset_size, length_size = sizes >> 12, (sizes >> 8) & 0xF
+    base_offset_size = (sizes >> 4) & 0xF
+    index_size = sizes & 0xF if version in (1, 2) else 0
+    item_count = _read_uint(f, 2 if version < 2 else 4)
+
+    locations = {}
+    for _ in range(item_count):
+        item_id = _read_uint(f, 2 if version < 2 else 4)
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = _read_uint(f, 2) & 0xF
+        f.seek(2, os.SEEK_CUR)  # data_reference_index
+        base_offset = _read_uint(f, base_offset_size)
+        extents = []
+        for _ in range(_read_uint(f, 2)):
+            f.seek(index_size, os.SEEK_CUR)
+            offset = _read_uint(f, offset_size)
+            length = _read_uint(f, length_size)
+            extents.append((base_offset + offset, length))
+        locations[item_id] = (construction_method, extents)
+    return locations
+
+
+def _read_item_properties(f, iprp_start, iprp_end, item_id):
+    """Return [(type, payload_start)] of the properties attached to an item."""
+    ipco = find_box(f, iprp_start, iprp_end, b"ipco")
+    ipma = find_box(f, iprp_start, iprp_end, b"ipma")
+    if ipco is None or ipma is None:
+        return []
+    properties = [
+        (box_type, payload_start)
+        for box_type, payload_start, _ in iter_boxes(f, *ipco)
+    ]
+
+    version, flags = _read_full_box_header(f, ipma[0])
+    indices = []
+    for _ in range(_read_uint(f, 4)):
+        entry_id = _read_uint(f, 2 if version < 1 else 4)
+        associations = [
+            _read_uint(f, 2 if flags & 1 else 1) for _ in range(_read_uint(f, 1))
+        ]
+        if entry_id == item_id:
+            # Top bit flags an essential property; the rest is a 1-based index
+            mask = 0x7FFF if flags & 1 else 0x7F
+            indices = [association & mask for association in associations]
+            break
+    return [
+        properties[index - 1] for index in indices if 0 < index <= len(properties)
+    ]
+
+
+def _read_display_size(f, properties):
+    """Return the primary image's (width, height) after its 'irot' rotation."""
+    size = None
+    rotation = 0
+    for box_type, payload_start in properties:
+        if box_type == b"ispe":
+            f.seek(payload_start + 4)
+            size = struct.unpack(">II", f.read(8))
+        elif box_type == b"irot":
+            f.seek(payload_start)
+            rotation = f.read(1)[0] & 0x3
+    if size is None:
+        raise ValueError("no 'ispe' property on the primary image")
+    width, height = size
+    if rotation in (1, 3):
+        width, height = height, width
+    return width, height
+
+
+def _read_exif(f, meta, file_end, construction_method, extents):
+    """Read an EXIF item and return it loaded into a Pillow Exif object."""
+    if construction_method not in (0, 1):
+        return Image.Exif()
+    if construction_method == 1:
+        # Stored inside the 'idat' box of 'meta'
+        idat = find_box(meta, 4, len(meta.getbuffer()), b"idat")
+        if idat is None:
+            return Image.Exif()
+        source, base, source_end = meta, idat[0], idat[1]
+    else:
+        source, base, source_end = f, 0, file_end
+
+    data = bytearray()
+    for offset, length in extents:
+        start = base + offset
+        if length == 0:
+            length = source_end - start
+        if len(data) + length > MAX_EXIF_SIZE:
+            raise ValueError("EXIF item too large")
+        source.seek(start)
+        data += source.read(length)
+
+    exif = Image.Exif()
+    if len(data) > 4:
+        # The item starts with the offset of the TIFF header that follows it
+        tiff_start = 4 + int.from_bytes(data[:4], "big")
+        exif.load(bytes(data[tiff_start:]))
+    return exif
+
+
+def read_heif_metadata(path):
+    """
+    Read a HEIC/HEIF file's display size and EXIF from its 'meta' box.
+
+    pillow_heif reads the whole file into memory just to open it, so this
+    walks the top-level box headers instead, reads only the 'meta' box and
+    then at most one small EXIF item. The size is the primary item's 'ispe'
+    with its 'irot' rotation applied, matching what pillow_heif reports.
+    Returns (width, height, exif) where exif is a Pillow Exif object, empty
+    if the file has no EXIF item.
+    """
+    with open(path, "rb") as f:
+        file_end = f.seek(0, os.SEEK_END)
+        location = find_box(f, 0, file_end, b"meta")
+        if location is None:
+            raise ValueError("no 'meta' box")
+        meta_start, meta_end = location
+        if meta_end - meta_start > MAX_META_SIZE:
+            raise ValueError("'meta' box too large")
+        f.seek(meta_start)
+        meta = io.BytesIO(f.read(meta_end - meta_start))
+        meta_size = len(meta.getbuffer())
+
+        # 'meta' is a FullBox: its children follow the version and flags
+        children = {
+            box_type: (payload_start, box_end)
+            for box_type, payload_start, box_end in iter_boxes(meta, 4, meta_size)
+        }
+        if b"pitm" not in children or b"iprp" not in children:
+            raise ValueError("no primary image")
+        primary_id = _read_primary_item(meta, children[b"pitm"][0])
+        width, height = _read_display_size(
+            meta, _read_item_properties(meta, *children[b"iprp"], primary_id)
+        )
+
+        exif = Image.Exif()
+        if b"iinf" in children and b"iloc" in children:
+            item_types = _read_item_types(meta, *children[b"iinf"])
+            locations = _read_item_locations(meta, children[b"iloc"][0])
+            for item_id, item_type in item_types.items():
+                if item_type == b"Exif" and item_id in locations:
+                    exif = _read_exif(f, meta, file_end, *locations[item_id])
+                    break
+
+    return width, height, exif
@@ -0,0 +1,112 @@
+import os
+from array import array
+from pathlib import Path
+
+# Raw BLAKE3 digest length; an all-zero digest marks a file that was not hashed
+DIGEST_SIZE = 32
+EMPTY_DIGEST = bytes(DIGEST_SIZE)
+
+
+class FileInventory:
+    """
+    Compact, column-oriented list of the files in a library.
+
+    Every file costs one 4-byte directory id, one 8-byte name offset, its
+    UTF-8 name bytes and a raw 32-byte digest, roughly 44 bytes plus the
+    name length. Parent directories are stored once and shared. At 5M files
+    with 24-byte names that is about 340 MB, against several GB for a dict
+    of hex strings mapping to lists of Path objects. Path objects are only
+    built on demand while iterating, one at a time.
+    """
+
+    __slots__ = (
+        "root_folder",
+        "directories",
+        "_directory_ids",
+        "dir_ids",
+        "name_blob",
+        "name_offsets",
+        "digest_blob",
+    )
+
+    def __init__(self, root_folder):
+        self.root_folder = root_folder
+        self.directories = []
+        self._directory_ids = {}
+        self.dir_ids = array("I")
+        self.name_blob = bytearray()
+        self.name_offsets = array("Q", [0])
+        self.digest_blob = bytearray()
+
+    def __len__(self):
+        return len(self.dir_ids)
+
+    def add(self, directory, name, digest=None):
+        """Append a file and return its index."""
+        dir_id = self._directory_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self.directories)
+            self._directory_ids[directory] = dir_id
+            self.directories.append(directory)
+
+        self.dir_ids.append(dir_id)
+        self.name_blob += os.fsencode(name)
+        self.name_offsets.append(len(self.name_blob))
+        self.digest_blob += digest or EMPTY_DIGEST
+        return len(self.dir_ids) - 1
+
+    def name(self, index):
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return os.fsdecode(bytes(self.name_blob[start:end]))
+
+    def path(self, index):
+        return Path(self.directories[self.dir_ids[index]], self.name(index))
+
+    def digest(self, index):
+        """Return the raw digest of a file, or None if it was not hashed."""
+        start = index * DIGEST_SIZE
+        digest = bytes(self.digest_blob[start : start + DIGEST_SIZE])
+        return None if digest == EMPTY_DIGEST else digest
+
+    def set_digest(self, index, digest):
+        start = index * DIGEST_SIZE
+        self.digest_blob[start : start + DIGEST_SIZE] = digest
+
+    def paths(self):
+        """Yield a Path for every file, in the order they were added."""
+        for index in range(len(self)):
+            yield self.path(index)
+
+    def duplicate_groups(self):
+        """
+        Yield lists of indices of files that share a digest.
+
+        Indices are counting-sorted by the first digest byte so that only
+        one of the 256 buckets is held in a dict at a time; within a group
+        the first-added file comes first.
+        """
+        digests = self.digest_blob
+        total = len(self)
+
+        bucket_starts = [0] * 257
+        for index in range(total):
+            bucket_starts[digests[index * DIGEST_SIZE] + 1] += 1
+        for bucket in range(256):
+            bucket_starts[bucket + 1] += bucket_starts[bucket]
+
+        order = array("I", [0]) * total
+        positions = bucket_starts[:256]
+        for index in range(total):
+            bucket = digests[index * DIGEST_SIZE]
+            order[positions[bucket]] = index
+            positions[bucket] += 1
+
+        for bucket in range(256):
+            groups = {}
+            for index in order[bucket_starts[bucket] : bucket_starts[bucket + 1]]:
+                digest = self.digest(index)
+                if digest is not None:
+                    groups.setdefault(digest, []).append(index)
+            for group in groups.values():
+                if len(group) > 1:
+                    yield group
@@ -0,0 +1,194 @@
+import logging
+import os
+import struct
+import sys
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Linux FIEMAP ioctl: a 32-byte struct fiemap header followed by 56-byte
+# struct fiemap_extent records; one extent is enough to place a file
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct("=QQIIII")
+FIEMAP_EXTENT = struct.Struct("=QQQQQIIII")
+FIEMAP_EXTENT_UNKNOWN = 0x2
+FIEMAP_EXTENT_DATA_INLINE = 0x200
+
+# Bytes of the next file queued for readahead while the current one hashes
+PREFETCH_BYTES = 8 << 20
+
+# Bytes kept in the page cache after hashing so the header read done by
+# sort_files does not seek back to the file
+KEEP_HEADER_BYTES = 256 << 10
+
+# Sort keys leave the top byte for the device, the rest for the position
+DEVICE_SHIFT = 56
+POSITION_MASK = (1 << DEVICE_SHIFT) - 1
+UNPLACED_KEY = (1 << 64) - 1
+
+# Most files handed to sorted() at once; larger sets are bucketed first
+SORT_BUCKET_SIZE = 4096
+
+
+def _fadvise(fd, offset, length, advice_name):
+    """Call posix_fadvise if this platform has it (macOS and Windows don't)."""
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        # Only a hint; some filesystems reject it
+        pass
+
+
+def advise_sequential(fd):
+    """Ask the kernel for aggressive readahead on a file read front to back."""
+    _fadvise(fd, 0, 0, "POSIX_FADV_SEQUENTIAL")
+
+
+def advise_done(fd):
+    """
+    Drop a fully read file from the page cache, except for its header.
+
+    A one-pass hash of a large library would otherwise push everything else
+    out of the cache, including the directories and the cache database.
+    """
+    _fadvise(fd, KEEP_HEADER_BYTES, 0, "POSIX_FADV_DONTNEED")
+
+
+def prefetch(path, length=PREFETCH_BYTES):
+    """Start readahead of the first bytes of a file without waiting for it."""
+    if not hasattr(os, "POSIX_FADV_WILLNEED"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        _fadvise(fd, 0, length, "POSIX_FADV_WILLNEED")
+    finally:
+        os.close(fd)
+
+
+def physical_offset(fd):
+    """Return the disk byte offset of a file's first extent, or None."""
+    request = FIEMAP_HEADER.pack(0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    buffer = bytearray(request + bytes(FIEMAP_EXTENT.size))
+    fcntl.ioctl(fd, FS_IOC_FIEMAP, buffer)
+    mapped_extents = FIEMAP_HEADER.unpack_from(buffer)[3]
+    if mapped_extents == 0:
+        return None
+    extent = FIEMAP_EXTENT.unpack_from(buffer, FIEMAP_HEADER.size)
+    physical, flags = extent[1], extent[5]
+    if flags & (FIEMAP_EXTENT_UNKNOWN | FIEMAP_EXTENT_DATA_INLINE):
+        return None
+    return physical
+
+
+def _order_by_key(keys):
+    """
+    Return array('I') of the positions of keys, stably ordered by key.
+
+    sorted() over all positions would hold two lists of int objects, about
+    88 bytes per file. Instead positions are bucket-sorted by key range
+    inside arrays, splitting again wherever a bucket is still large, and
+    only buckets of up to SORT_BUCKET_SIZE go through sorted().
+    """
+    order = array("I", range(len(keys)))
+    pending = [(0, len(order))]
+    while pending:
+        start, end = pending.pop()
+        if end - start <= SORT_BUCKET_SIZE:
+            order[start:end] = array(
+                "I", sorted(order[start:end], key=keys.__getitem__)
+            )
+            continue
+
+        # Slots are walked by number; slicing order would copy the range
+        slots = range(start, end)
+        low = min(keys[order[slot]] for slot in slots)
+        high = max(keys[order[slot]] for slot in slots)
+        if low == high:
+            continue
+        bucket_count = (end - start) // SORT_BUCKET_SIZE + 1
+        span = high - low + 1
+
+        bucket_starts = array("Q", [0]) * (bucket_count + 1)
+        for slot in slots:
+            bucket = (keys[order[slot]] - low) * bucket_count // span
+            bucket_starts[bucket + 1] += 1
+        for bucket in range(bucket_count):
+            bucket_starts[bucket + 1] += bucket_starts[bucket]
+
+        placed = array("I", [0]) * (end - start)
+        next_slots = bucket_starts[:bucket_count]
+        for slot in slots:
+            position = order[slot]
+            bucket = (keys[position] - low) * bucket_count // span
+            placed[next_slots[bucket]] = position
+            next_slots[bucket] += 1
+        order[start:end] = placed
+        del placed
+
+        for bucket in range(bucket_count):
+            if bucket_starts[bucket + 1] - bucket_starts[bucket] > 1:
+                pending.append(
+                    (start + bucket_starts[bucket], start + bucket_starts[bucket + 1])
+                )
+    return order
+
+
+def read_order(inventory, indices=None, use_extents=True):
+    """
+    Return inventory indices in the order their data sits on disk.
+
+    Files are ordered by the physical offset of their first extent where
+    the filesystem reports it (FIEMAP on Linux), otherwise by inode number,
+    which most filesystems allocate roughly in write order. On a spinning
+    disk this turns the directory-order walk into mostly forward seeks.
+    Files that cannot be placed keep their relative order at the end.
+    Besides the 4-byte result, this needs an 8-byte key and at most a
+    4-byte scratch slot per file.
+    """
+    if indices is None:
+        indices = range(len(inventory))
+    use_extents = use_extents and fcntl is not None and sys.platform == "linux"
+    devices = {}
+    # Sized up front; appending would over-allocate as the array grows
+    keys = array("Q", [0]) * len(indices)
+    for slot, index in enumerate(indices):
+        path = inventory.path(index)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            keys[slot] = UNPLACED_KEY
+            continue
+
+        position = None
+        if use_extents:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    position = physical_offset(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # Not supported by this filesystem; inode order from here on
+                use_extents = False
+        if position is None:
+            position = stat_result.st_ino
+
+        device = devices.setdefault(stat_result.st_dev, len(devices))
+        keys[slot] = (device << DEVICE_SHIFT) | (position & POSITION_MASK)
+
+    order = _order_by_key(keys)
+    del keys
+    for slot, position in enumerate(order):
+        order[slot] = indices[position]
+    return order
@@ -0,0 +1,29 @@
+import struct
+
+
+def iter_boxes(f, start, end):
+    """Yield (type, payload_start, box_end) for the boxes in [start, end)."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            # 64-bit size follows the type
+            (size,) = struct.unpack(">Q", f.read(8))
+            header_size = 16
+        elif size == 0:
+            # Box runs to the end of its parent
+            size = end - offset
+        if size < header_size:
+            raise ValueError(f"corrupt '{box_type.decode('latin-1')}' box")
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def find_box(f, start, end, wanted):
+    """Return (payload_start, box_end) of the first box of a type, or None."""
+    for box_type, payload_start, box_end in iter_boxes(f, start, end):
+        if box_type == wanted:
+            return payload_start, box_end
+    return None
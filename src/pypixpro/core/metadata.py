@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from PIL import Image
+
+from .heif import read_heif_metadata
+from .rules import HEIF_EXTENSIONS, VIDEO_EXTENSIONS
+from .video import read_video_metadata
+
+# EXIF tag ids (0th IFD)
+EXIF_MAKE = 0x010F
+EXIF_MODEL = 0x0110
+EXIF_SOFTWARE = 0x0131
+EXIF_DATETIME = 0x0132
+EXIF_IFD_POINTER = 0x8769
+
+# EXIF tag ids (Exif sub-IFD)
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def _exif_text(exif, tag):
+    value = exif.get(tag)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "ignore")
+    return value.strip("\x00 ").strip() if value else None
+
+
+def _exif_capture_time(exif):
+    """Return DateTimeOriginal (or DateTime) as an ISO string, or None."""
+    for value in (
+        exif.get_ifd(EXIF_IFD_POINTER).get(EXIF_DATETIME_ORIGINAL),
+        exif.get(EXIF_DATETIME),
+    ):
+        if isinstance(value, bytes):
+            value = value.decode("ascii", "ignore")
+        if not value:
+            continue
+        try:
+            taken = datetime.strptime(value.strip("\x00 "), EXIF_DATE_FORMAT)
+            return taken.isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def capture_time(metadata, path):
+    """Return when a file was taken, falling back to its modification time."""
+    if metadata.get("captured_at"):
+        return datetime.fromisoformat(metadata["captured_at"])
+    return datetime.fromtimestamp(path.stat().st_mtime)
+
+
+def date_folder(metadata, path):
+    """Return the 'YYYY/YYYY-MM' sub-folder for a file's capture time."""
+    taken = capture_time(metadata, path)
+    return f"{taken:%Y}/{taken:%Y-%m}"
+
+
+def read_metadata(path, read_header=True):
+    """
+    Gather the metadata classification rules look at, in one header read.
+
+    Image.open only parses the container header, so no pixel data is
+    decoded here. HEIC/HEIF files are read from their 'meta' box rather
+    than through pillow_heif, whose opener loads the whole file, and videos
+    from their MP4/MOV boxes without touching any frames. With read_header
+    False only the values derived from the path are filled in.
+    captured_at comes from EXIF (or the video's creation time) only; see
+    capture_time for the mtime fallback.
+    """
+    metadata = {
+        "extension": path.suffix.lower(),
+        "width": None,
+        "height": None,
+        "megapixels": None,
+        "aspect_ratio": None,
+        "camera_make": None,
+        "camera_model": None,
+        "software": None,
+        "captured_at": None,
+    }
+    if not read_header:
+        return metadata
+
+    if metadata["extension"] in VIDEO_EXTENSIONS:
+        width, height, captured_at = read_video_metadata(path)
+        metadata["captured_at"] = captured_at
+    else:
+        if metadata["extension"] in HEIF_EXTENSIONS:
+            width, height, exif = read_heif_metadata(path)
+        else:
+            with Image.open(path) as img:
+                width, height = img.size
+                exif = img.getexif()
+        metadata.update(
+            camera_make=_exif_text(exif, EXIF_MAKE),
+            camera_model=_exif_text(exif, EXIF_MODEL),
+            software=_exif_text(exif, EXIF_SOFTWARE),
+            captured_at=_exif_capture_time(exif),
+        )
+
+    aspect_ratio = None
+    if width and height:
+        # Long side over short side, so panoramas are >= 2 either way round
+        aspect_ratio = max(width, height) / min(width, height)
+
+    metadata.update(
+        width=width,
+        height=height,
+        megapixels=width * height / 1_000_000,
+        aspect_ratio=aspect_ratio,
+    )
+    return metadata
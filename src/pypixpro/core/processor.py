@@ -2,11 +2,46 @@ import logging
 import os
 import re
 import shutil
+from array import array
 from pathlib import Path
-import blake3
-from PIL import Image
 import pillow_heif
 
+from .cache import CACHE_DIR_NAME, LibraryCache
+from .checkpoint import (
+    STAGE_BACKUP,
+    STAGE_CLEAN,
+    STAGE_COUNT,
+    STAGE_DEDUPE,
+    STAGE_RENAME,
+    STAGE_SORT,
+    RunCheckpoint,
+)
+from .common import (
+    ProcessingCancelled,
+    check_cancelled,
+    ensure_inside,
+    hash_file,
+    is_excluded_name,
+    iter_files,
+    report_progress,
+    scan_inventory,
+)
+from .io_order import prefetch, read_order
+from .metadata import date_folder, read_metadata
+from .rules import (
+    DEFAULT_RULE_SET,
+    HEIF_EXTENSIONS,
+    IMAGE_EXTENSIONS,
+    LANDSCAPE_FOLDER_NAME,
+    PORTRAIT_FOLDER_NAME,
+    RANDOM_FOLDER_NAME,
+    SCREENSHOTS_FOLDER_NAME,
+    VIDEO_EXTENSIONS,
+    compile_rules,
+    load_rules,
+)
+from .transcode import TRANSCODE_FORMATS, transcode_heic_files
+
 # Register HEIF opener to handle HEIC files
 pillow_heif.register_heif_opener()
 
@@ -14,270 +49,491 @@ pillow_heif.register_heif_opener()
 logger = logging.getLogger(__name__)
 
 # --- Constants ---
-PORTRAIT_FOLDER_NAME = "Portrait"
-LANDSCAPE_FOLDER_NAME = "Landscape"
-GIF_FOLDER_NAME = "GIF"
-RANDOM_FOLDER_NAME = "Random"
-PRORAW_FOLDER_NAME = "ProRaw"
-SCREENSHOTS_FOLDER_NAME = "Screenshots"
+RENAMEABLE_EXTENSIONS = HEIF_EXTENSIONS + IMAGE_EXTENSIONS
+
+# Temporary names used between the two phases of a full renumber
+RENUMBER_TEMP_PREFIX = ".pypixpro-renumber-"
+
+# Extensions whose header is read for a capture date in the date layout
+DATED_EXTENSIONS = HEIF_EXTENSIONS + IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
 
-EXCLUDE_FILES = {".ds_store", "thumbs.db", "desktop.ini"}
+# sort_files layouts
+LAYOUT_ORIENTATION = "orientation"  # Landscape/
+LAYOUT_DATE = "date"  # Landscape/2024/2024-06/
 
 # --- Core Logic Functions ---
 
 
-def backup_folder(src_folder):
-    """Create a backup of the input folder on the Desktop."""
+def _already_copied(source, destination):
+    """Check whether an earlier, interrupted backup already copied a file."""
+    try:
+        source_stat = os.stat(source)
+        destination_stat = os.stat(destination)
+    except OSError:
+        return False
+    # copy2 sets the mtime only once the data is written
+    return (
+        source_stat.st_size == destination_stat.st_size
+        and source_stat.st_mtime_ns == destination_stat.st_mtime_ns
+    )
+
+
+def backup_folder(src_folder, progress_callback=None, cancel_event=None):
+    """
+    Create a backup of the input folder on the Desktop.
+
+    Cancellation is checked before every file, and files a cancelled or
+    interrupted backup already copied are skipped when it is resumed.
+    """
     backup_path = Path.home() / "Desktop" / f"{src_folder.name}_Backup"
+    # Copy under a temporary name so an interrupted backup is never mistaken
+    # for a complete one; a rerun continues into the same partial folder
+    partial_path = backup_path.with_name(f"{backup_path.name}.partial")
+    if backup_path.exists():
+        logger.info(f"✅ Backup already exists at: {backup_path}")
+        return
+
+    total = 0
+    for _, directories, files in os.walk(src_folder):
+        directories[:] = [name for name in directories if name != CACHE_DIR_NAME]
+        total += len(files)
+    done = 0
+
+    def copy_file(source, destination):
+        nonlocal done
+        check_cancelled(cancel_event)
+        if not _already_copied(source, destination):
+            shutil.copy2(source, destination)
+        done += 1
+        report_progress(progress_callback, "Backing up", done, total)
+        return destination
+
     try:
-        if not backup_path.exists():
-            shutil.copytree(src_folder, backup_path, dirs_exist_ok=True)
-            logger.info(f"✅ Backup completed at: {backup_path}")
-        else:
-            logger.info(f"✅ Backup already exists at: {backup_path}")
+        shutil.copytree(
+            src_folder,
+            partial_path,
+            copy_function=copy_file,
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns(CACHE_DIR_NAME),
+        )
+        partial_path.rename(backup_path)
+        logger.info(f"✅ Backup completed at: {backup_path}")
+    except ProcessingCancelled:
+        raise
     except Exception as e:
         logger.error(f"❌ Backup failed: {e}")
 
 
-def generate_checksums(root_folder):
-    """Generate a dictionary of checksums for all files in the root folder."""
-    checksums = {}
-    for path in root_folder.rglob("*"):
-        if path.is_file() and not is_excluded(path):
+def generate_checksums(
+    root_folder, progress_callback=None, cancel_event=None, cache=None
+):
+    """
+    Hash every file in the root folder into a FileInventory.
+
+    Digests still valid in the cache are filled in first. The remaining
+    files are read in on-disk order, with readahead already started on the
+    next file while the current one is hashed, so a spinning disk mostly
+    seeks forward instead of jumping around in directory order.
+    """
+    inventory = scan_inventory(root_folder)
+    done = 0
+    to_read = array("I")
+    for index, path in enumerate(inventory.paths()):
+        check_cancelled(cancel_event)
+        digest = None
+        if cache is not None:
             try:
-                with open(path, "rb") as f:
-                    file_hash = blake3.blake3(f.read()).hexdigest()
-                checksums.setdefault(file_hash, []).append(path)
-            except Exception as e:
-                logger.error(f"❌ Error generating checksum for {path}: {e}")
-    return checksums
+                digest = cache.lookup_digest(path, path.stat())
+            except OSError:
+                pass
+        if digest is None:
+            to_read.append(index)
+            continue
+        inventory.set_digest(index, digest)
+        done += 1
+        report_progress(progress_callback, "Hashing", done, len(inventory))
+
+    order = read_order(inventory, to_read)
+    for position, index in enumerate(order):
+        check_cancelled(cancel_event)
+        path = inventory.path(index)
+        if position + 1 < len(order):
+            prefetch(inventory.path(order[position + 1]))
+        try:
+            inventory.set_digest(index, hash_file(path, cache))
+        except Exception as e:
+            logger.error(f"❌ Error generating checksum for {path}: {e}")
+        done += 1
+        report_progress(progress_callback, "Hashing", done, len(inventory))
+    return inventory
 
 
 def is_excluded(path):
     """Check if a file should be excluded."""
-    name_lower = path.name.lower()
-    return name_lower in EXCLUDE_FILES or name_lower.startswith("icon")
+    return is_excluded_name(path.name) or CACHE_DIR_NAME in path.parts
 
 
-def delete_duplicates(root_folder):
+def delete_duplicates(
+    root_folder, progress_callback=None, cancel_event=None, cache=None
+):
     """Delete duplicate files based on checksums."""
-    checksums = generate_checksums(root_folder)
+    inventory = generate_checksums(
+        root_folder, progress_callback, cancel_event, cache
+    )
     deleted_count = {}  # Track deleted counts per extension
-    for file_list in checksums.values():
-        if len(file_list) > 1:
-            # Keep the first file, delete the rest
-            for duplicate in file_list[1:]:
-                try:
-                    ext = duplicate.suffix.lower()
-                    deleted_count[ext] = deleted_count.get(ext, 0) + 1
-                    duplicate.unlink()
-                    logger.info(f"✅ Deleted duplicate: {duplicate}")
-                except Exception as e:
-                    logger.error(f"❌ Error deleting duplicate {duplicate}: {e}")
+    for group in inventory.duplicate_groups():
+        # Keep the first file, delete the rest
+        for index in group[1:]:
+            check_cancelled(cancel_event)
+            duplicate = inventory.path(index)
+            try:
+                duplicate.unlink()
+                ext = duplicate.suffix.lower()
+                deleted_count[ext] = deleted_count.get(ext, 0) + 1
+                if cache is not None:
+                    cache.forget(duplicate)
+                logger.info(f"✅ Deleted duplicate: {duplicate}")
+            except Exception as e:
+                logger.error(f"❌ Error deleting duplicate {duplicate}: {e}")
     return deleted_count
 
 
-def rename_files(target_folder, prefix):
-    """Rename files sequentially with the given prefix and orientation."""
+def sequence_name(prefix, orientation, number, suffix):
+    """Build a '{prefix} {V|W} NNN.ext' file name."""
+    return f"{prefix} {orientation} {str(number).zfill(3)}{suffix}"
+
+
+def parse_sequence_number(name, prefix, orientation):
+    """Return the sequence number of a '{prefix} {V|W} NNN.ext' name, or None."""
+    match = re.fullmatch(
+        rf"{re.escape(prefix)} {orientation} (\d{{3,}})\.[^.]+", name
+    )
+    return int(match.group(1)) if match else None
+
+
+def rename_files(
+    target_folder,
+    prefix,
+    renumber=False,
+    progress_callback=None,
+    cancel_event=None,
+    cache=None,
+    orientation=None,
+):
+    """
+    Rename files sequentially with the given prefix and orientation.
+
+    By default only files that do not already follow the '{prefix} V/W NNN'
+    pattern are renamed, taking the numbers after the highest one in use.
+    Pass renumber=True to renumber the whole folder from 001; that pass goes
+    through temporary names first so no target can collide mid-rename, and
+    is not interrupted by cancel_event once it has started.
+
+    orientation ("V" or "W") defaults to one derived from the folder name;
+    pass it explicitly for nested folders such as Portrait/2024/2024-06.
+    """
     if target_folder.name in [RANDOM_FOLDER_NAME, SCREENSHOTS_FOLDER_NAME]:
         logger.info(f"⏩ Skipping renaming for folder: {target_folder.name}")
         return  # Exit the function without renaming files in Random or Screenshots
 
-    files = sorted(target_folder.glob("*"))
-    for idx, file in enumerate(files, 1):
-        # Skip renaming for non-image file types:
-        if file.suffix.lower() not in (
-            ".jpg",
-            ".jpeg",
-            ".bmp",
-            ".tiff",
-            ".tif",
-            ".psd",
-            ".svg",
-            ".ico",
-            ".jfif",
-            ".pjpeg",
-            ".pjp",
-            ".avif",
-            ".apng",
-            ".heic",
-            ".heif",
-        ):
-            continue  # Skip to the next file
-
-        # Determine the orientation (V or W) based on the target folder name
+    # Determine the orientation (V or W) based on the target folder name
+    if orientation is None:
         orientation = "V" if target_folder.name == PORTRAIT_FOLDER_NAME else "W"
 
-        # Use the user-provided prefix if it exists; otherwise, default to folder name
-        effective_prefix = prefix if prefix else target_folder.name
+    # Use the user-provided prefix if it exists; otherwise, default to folder name.
+    # It is cleaned up front so the names written here survive clean_filenames
+    # and are recognised as already numbered on the next run.
+    effective_prefix = (clean_name(prefix) if prefix else "") or target_folder.name
+
+    _finish_renumber(target_folder, effective_prefix, orientation, cache)
+
+    # Skip renaming for non-image file types
+    files = [
+        file
+        for file in sorted(target_folder.glob("*"))
+        if file.is_file() and file.suffix.lower() in RENAMEABLE_EXTENSIONS
+    ]
+
+    if renumber:
+        _renumber_files(target_folder, files, effective_prefix, orientation, cache)
+        return
+
+    used_numbers = set()
+    new_files = []
+    for file in files:
+        number = parse_sequence_number(file.name, effective_prefix, orientation)
+        if number is None:
+            new_files.append(file)
+        else:
+            used_numbers.add(number)
+
+    if not new_files:
+        logger.info(f"✅ No new files to rename in: {target_folder.name}")
+        return
 
-        # Construct the new file name with correct spacing
-        new_name = f"{effective_prefix} {orientation} {str(idx).zfill(3)}{file.suffix}"
+    next_number = max(used_numbers, default=0) + 1
+    for done, file in enumerate(new_files, 1):
+        check_cancelled(cancel_event)
+        new_path = target_folder / sequence_name(
+            effective_prefix, orientation, next_number, file.suffix
+        )
+        # A file with a differently-cased suffix may already hold this name
+        while new_path.exists():
+            next_number += 1
+            new_path = target_folder / sequence_name(
+                effective_prefix, orientation, next_number, file.suffix
+            )
 
         try:
-            file.rename(target_folder / new_name)
-            logger.info(f"✅ Renamed: '{file.name}' to '{new_name}'")
+            file.rename(new_path)
+            if cache is not None:
+                cache.move(file, new_path)
+            logger.info(f"✅ Renamed: '{file.name}' to '{new_path.name}'")
+            next_number += 1
         except Exception as e:
             logger.error(f"❌ Error renaming {file.name}: {e}")
+        report_progress(progress_callback, "Renaming", done, len(new_files))
 
 
-def process_heic_image(path):
-    """Process HEIC image to determine its dimensions."""
-    try:
-        heif_file = pillow_heif.read_heif(path)
-        image = Image.frombytes(
-            heif_file.mode,
-            heif_file.size,
-            heif_file.data,
-            "raw",
+def _finish_renumber(target_folder, prefix, orientation, cache=None):
+    """Complete a renumber that was interrupted between its two phases."""
+    for temp_path in sorted(target_folder.glob(f"{RENUMBER_TEMP_PREFIX}*")):
+        idx = temp_path.stem[len(RENUMBER_TEMP_PREFIX) :]
+        if not idx.isdigit():
+            continue
+        new_path = target_folder / sequence_name(
+            prefix, orientation, int(idx), temp_path.suffix
         )
-        width, height = image.size
-        logger.info(f"✅ Processed HEIC: {path.name} - {width}x{height}")
-        return width, height
-    except Exception as e:
-        logger.error(f"❌ Error processing HEIC {path}: {e}")
-        return None, None
+        # If the slot is taken the temp file is simply renamed like a new file
+        if new_path.exists():
+            continue
+        try:
+            temp_path.rename(new_path)
+            if cache is not None:
+                cache.move(temp_path, new_path)
+            logger.info(f"♻️ Finished interrupted rename: '{new_path.name}'")
+        except Exception as e:
+            logger.error(f"❌ Error renaming {temp_path.name}: {e}")
 
 
-def sort_files(root_folder, portrait_prefix, landscape_prefix):
-    """Sort files into appropriate folders based on type and aspect ratio."""
-    counts = {"Portrait": 0, "Landscape": 0, "Total Files": 0}
-    dynamic_folders = {}
+def _renumber_files(target_folder, files, prefix, orientation, cache=None):
+    """Renumber files from 001 in two phases so targets never collide."""
+    staged = []
+    for idx, file in enumerate(files, 1):
+        temp_path = target_folder / f"{RENUMBER_TEMP_PREFIX}{idx}{file.suffix}"
+        try:
+            file.rename(temp_path)
+            if cache is not None:
+                cache.move(file, temp_path)
+            staged.append((file.name, temp_path))
+        except Exception as e:
+            logger.error(f"❌ Error renaming {file.name}: {e}")
 
-    for path in root_folder.rglob("*"):
-        if path.is_file() and not is_excluded(path):
-            counts["Total Files"] += 1
-            suffix = path.suffix.lower()
+    for idx, (original_name, temp_path) in enumerate(staged, 1):
+        new_name = sequence_name(prefix, orientation, idx, temp_path.suffix)
+        try:
+            temp_path.rename(target_folder / new_name)
+            if cache is not None:
+                cache.move(temp_path, target_folder / new_name)
+            logger.info(f"✅ Renamed: '{original_name}' to '{new_name}'")
+        except Exception as e:
+            logger.error(f"❌ Error renaming {original_name}: {e}")
 
-            try:
-                if suffix in (".heic", ".heif"):
-                    width, height = process_heic_image(path)
-                    if width and height:
-                        if height > width:
-                            target_folder_name = PORTRAIT_FOLDER_NAME
-                            counts["Portrait"] += 1
-                        else:
-                            target_folder_name = LANDSCAPE_FOLDER_NAME
-                            counts["Landscape"] += 1
-                        folder = dynamic_folders.setdefault(
-                            target_folder_name, root_folder / target_folder_name
-                        )
-                        if not folder.exists():
-                            folder.mkdir(parents=True, exist_ok=True)
-                        shutil.move(str(path), folder / path.name)
-                        logger.info(
-                            f"✅ Moved HEIC to {target_folder_name}: {path.name}"
-                        )
 
-                elif suffix in (
-                    ".jpg",
-                    ".jpeg",
-                    ".bmp",
-                    ".tiff",
-                    ".tif",
-                    ".psd",
-                    ".svg",
-                    ".ico",
-                    ".jfif",
-                    ".pjpeg",
-                    ".pjp",
-                    ".avif",
-                    ".apng",
-                ):
-                    with Image.open(path) as img:
-                        width, height = img.size
-                        logger.info(
-                            f"✅ Processed Image: {path.name} - {width}x{height}"
-                        )
-                        if height > width:
-                            target_folder_name = PORTRAIT_FOLDER_NAME
-                            counts["Portrait"] += 1
-                        else:
-                            target_folder_name = LANDSCAPE_FOLDER_NAME
-                            counts["Landscape"] += 1
-                        folder = dynamic_folders.setdefault(
-                            target_folder_name, root_folder / target_folder_name
-                        )
-                        if not folder.exists():
-                            folder.mkdir(parents=True, exist_ok=True)
-                        shutil.move(str(path), folder / path.name)
-                        logger.info(
-                            f"✅ Moved Image to {target_folder_name}: {path.name}"
-                        )
+def unique_destination(folder, name):
+    """Return folder/name, adding '-N' before the suffix if it is taken."""
+    destination = folder / name
+    counter = 1
+    while destination.exists():
+        destination = folder / f"{Path(name).stem}-{counter}{Path(name).suffix}"
+        counter += 1
+    return destination
 
-                elif suffix == ".png":
-                    folder = dynamic_folders.setdefault(
-                        SCREENSHOTS_FOLDER_NAME, root_folder / SCREENSHOTS_FOLDER_NAME
-                    )
-                    if not folder.exists():
-                        folder.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(path), folder / path.name)
-                    logger.info(f"✅ Moved PNG (Screenshot): {path} to {folder}")
-
-                elif suffix in (".gif", ".webp"):
-                    folder = dynamic_folders.setdefault(
-                        GIF_FOLDER_NAME, root_folder / GIF_FOLDER_NAME
-                    )
-                    if not folder.exists():
-                        folder.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(path), folder / path.name)
-                    logger.info(f"✅ Moved GIF: {path} to {folder}")
-
-                elif suffix in (
-                    ".dng",
-                    ".raw",
-                    ".nef",
-                    ".cr2",
-                    ".cr3",
-                    ".arw",
-                    ".orf",
-                    ".rw2",
-                    ".raf",
-                    ".srw",
-                    ".kdc",
-                ):
-                    folder = dynamic_folders.setdefault(
-                        PRORAW_FOLDER_NAME, root_folder / PRORAW_FOLDER_NAME
-                    )
-                    if not folder.exists():
-                        folder.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(path), folder / path.name)
-                    logger.info(f"✅ Moved ProRaw: {path} to {folder}")
-
-                else:
-                    folder = dynamic_folders.setdefault(
-                        RANDOM_FOLDER_NAME, root_folder / RANDOM_FOLDER_NAME
-                    )
-                    if not folder.exists():
-                        folder.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(path), folder / path.name)
-                    logger.info(f"✅ Moved Misc: {path} to {folder}")
 
-            except Exception as e:
-                logger.error(f"❌ Error processing {path}: {e}")
+def _cached_digest(path, cache):
+    """Return a file's digest if the cache still has it, without hashing."""
+    if cache is None:
+        return None
+    return cache.lookup_digest(path, path.stat())
+
+
+def cached_metadata(path, rule_set, cache=None, layout=LAYOUT_ORIENTATION):
+    """
+    Return a file's metadata if it is known without reading its header.
+
+    That is when neither the rules for its extension nor the layout look at
+    the header, or when the cache has both its digest and its metadata.
+    Files are never hashed here. Returns None otherwise.
+    """
+    suffix = path.suffix.lower()
+    # Only open the file when a rule or the layout needs its header
+    read_header = rule_set.needs_header(suffix) or (
+        layout == LAYOUT_DATE and suffix in DATED_EXTENSIONS
+    )
+    if not read_header:
+        return read_metadata(path, read_header=False)
+
+    digest = _cached_digest(path, cache)
+    if digest is not None:
+        cached = cache.get_metadata(digest)
+        if cached is not None:
+            # The extension belongs to the path, not the content
+            cached["extension"] = suffix
+            return cached
+    return None
+
+
+def gather_metadata(path, rule_set, cache=None, layout=LAYOUT_ORIENTATION):
+    """
+    Return a file's metadata from the cache or from one header read.
+
+    A header that had to be read is cached under the file's digest if the
+    cache already knows it; the file is not hashed just for that.
+    """
+    metadata = cached_metadata(path, rule_set, cache, layout)
+    if metadata is not None:
+        return metadata
+
+    try:
+        metadata = read_metadata(path)
+    except Exception as e:
+        # Unreadable files can still match rules that ignore the header
+        logger.warning(f"⚠️ Could not read header of {path.name}: {e}")
+        return read_metadata(path, read_header=False)
+
+    digest = _cached_digest(path, cache)
+    if digest is not None:
+        cache.put_metadata(digest, metadata)
+    return metadata
+
+
+def classify_file(path, metadata, rule_set, layout=LAYOUT_ORIENTATION):
+    """
+    Return (rule_name, bucket, folder) for a file, or None if no rule matches.
+
+    bucket is the folder the rule picked, folder the path relative to the
+    library root it will be moved to once the layout has been applied.
+    """
+    match = rule_set.classify(metadata)
+    if match is None:
+        return None
+    rule_name, bucket = match
+    folder = bucket
+    if layout == LAYOUT_DATE:
+        folder = f"{bucket}/{date_folder(metadata, path)}"
+    return rule_name, bucket, folder
+
+
+def sort_files(
+    root_folder,
+    portrait_prefix,
+    landscape_prefix,
+    progress_callback=None,
+    cancel_event=None,
+    rule_set=None,
+    cache=None,
+    layout=LAYOUT_ORIENTATION,
+):
+    """
+    Sort files into the folders chosen by the classification rules.
+
+    With layout=LAYOUT_DATE each bucket is split further into
+    'YYYY/YYYY-MM' folders by EXIF capture time, falling back to mtime.
+    When a cache is given, header metadata is looked up by content hash
+    first, so files that were sorted before are never parsed again. The
+    files whose header does have to be read are read in on-disk order.
+    """
+    rule_set = rule_set or DEFAULT_RULE_SET
+    dynamic_folders = {}
+    inventory = scan_inventory(root_folder)
+    counts = {"Portrait": 0, "Landscape": 0, "Total Files": len(inventory)}
+    done = 0
+
+    def place(path, metadata):
+        """Move one file to the folder its rule picks, if it is not there yet."""
+        match = classify_file(path, metadata, rule_set, layout)
+        if match is None:
+            logger.info(f"⏩ No rule matched, leaving in place: {path.name}")
+            return
+        rule_name, bucket, target_folder_name = match
+        folder = dynamic_folders.get(target_folder_name)
+        if folder is None:
+            folder = root_folder / target_folder_name
+            # Never move a file out of the library, whatever a rule resolves to
+            ensure_inside(root_folder, folder)
+            dynamic_folders[target_folder_name] = folder
+        counts[bucket] = counts.get(bucket, 0) + 1
+        if path.parent == folder:
+            # Sorted by an earlier (possibly interrupted) run
+            return
+        if not folder.exists():
+            folder.mkdir(parents=True, exist_ok=True)
+        destination = unique_destination(folder, path.name)
+        shutil.move(str(path), destination)
+        if cache is not None:
+            cache.move(path, destination)
+        logger.info(
+            f"✅ Moved {rule_name} to {target_folder_name}: {destination.name}"
+        )
+
+    # Files whose metadata needs no header read are placed straight away
+    to_read = array("I")
+    for index in range(len(inventory)):
+        check_cancelled(cancel_event)
+        path = inventory.path(index)
+        try:
+            metadata = cached_metadata(path, rule_set, cache, layout)
+            if metadata is None:
+                to_read.append(index)
+                continue
+            place(path, metadata)
+        except Exception as e:
+            logger.error(f"❌ Error processing {path}: {e}")
+        done += 1
+        report_progress(progress_callback, "Sorting", done, len(inventory))
+
+    # Header reads follow the on-disk layout rather than directory order
+    for index in read_order(inventory, to_read):
+        check_cancelled(cancel_event)
+        path = inventory.path(index)
+        try:
+            place(path, gather_metadata(path, rule_set, cache, layout))
+        except Exception as e:
+            logger.error(f"❌ Error processing {path}: {e}")
+        done += 1
+        report_progress(progress_callback, "Sorting", done, len(inventory))
 
     return counts
 
 
-def clean_filenames(root_folder):
+def clean_name(name):
+    """Return name without special characters and with single spaces."""
+    # Keep spaces in filenames during cleaning
+    cleaned_name = re.sub(r"[^\w\s\-\.]", "", name)
+    return re.sub(r"\s+", " ", cleaned_name).strip()  # Replace multiple spaces
+
+
+def clean_filenames(
+    root_folder, progress_callback=None, cancel_event=None, cache=None
+):
     """Clean filenames by removing spaces and special characters."""
     renamed_files = []
-    for path in root_folder.rglob("*"):
-        if path.is_file() and not is_excluded(path):
-            original_name = path.name
-            # Keep spaces in filenames during cleaning
-            cleaned_name = re.sub(r"[^\w\s\-\.]", "", original_name)
-            cleaned_name = re.sub(
-                r"\s+", " ", cleaned_name
-            ).strip()  # Replace multiple spaces with single
-
-            if cleaned_name and cleaned_name != original_name:
-                new_path = path.parent / cleaned_name
-                try:
-                    path.rename(new_path)
-                    renamed_files.append((original_name, cleaned_name))
-                except Exception as e:
-                    logger.error(f"❌ Failed to rename '{original_name}': {e}")
+    inventory = scan_inventory(root_folder)
+    for done, path in enumerate(inventory.paths(), 1):
+        check_cancelled(cancel_event)
+        original_name = path.name
+        cleaned_name = clean_name(original_name)
+
+        if cleaned_name and cleaned_name != original_name:
+            new_path = path.parent / cleaned_name
+            try:
+                path.rename(new_path)
+                if cache is not None:
+                    cache.move(path, new_path)
+                renamed_files.append((original_name, cleaned_name))
+            except Exception as e:
+                logger.error(f"❌ Failed to rename '{original_name}': {e}")
+        report_progress(progress_callback, "Cleaning", done, len(inventory))
 
     if renamed_files:
         logger.info("\n✅ Renaming Operations:")
@@ -294,20 +550,18 @@ def clean_filenames(root_folder):
 def count_files(root_folder):
     """Count initial files per extension."""
     initial_count = {}
-    for path in root_folder.rglob("*"):
-        if path.is_file() and not is_excluded(path):
-            ext = path.suffix.lower()
-            initial_count[ext] = initial_count.get(ext, 0) + 1
+    for _, name in iter_files(root_folder):
+        ext = Path(name).suffix.lower()
+        initial_count[ext] = initial_count.get(ext, 0) + 1
     return initial_count
 
 
 def count_remaining_files(root_folder):
     """Count remaining files per extension after deletion."""
     remaining_count = {}
-    for path in root_folder.rglob("*"):
-        if path.is_file() and not is_excluded(path):
-            ext = path.suffix.lower()
-            remaining_count[ext] = remaining_count.get(ext, 0) + 1
+    for _, name in iter_files(root_folder):
+        ext = Path(name).suffix.lower()
+        remaining_count[ext] = remaining_count.get(ext, 0) + 1
     return remaining_count
 
 
@@ -364,56 +618,207 @@ def print_summary_table(initial_count, deleted_count, remaining_count):
     logger.info("\n")
 
 
+def open_cache(root_folder):
+    """Open the library's hash/metadata cache, or return None if unavailable."""
+    try:
+        return LibraryCache(root_folder)
+    except Exception as e:
+        logger.warning(f"⚠️ Cache unavailable, everything will be re-read: {e}")
+        return None
+
+
 def run_processing(
-    input_folder_path, portrait_prefix="Portrait", landscape_prefix="Landscape"
+    input_folder_path,
+    portrait_prefix="Portrait",
+    landscape_prefix="Landscape",
+    renumber=False,
+    progress_callback=None,
+    cancel_event=None,
+    rules_path=None,
+    layout=LAYOUT_ORIENTATION,
+    transcode_format=None,
+    transcode_folder=None,
 ):
     """
     Run the photo processing workflow on the given folder.
+
+    rules_path points at a TOML or JSON rules file that replaces the
+    built-in Portrait/Landscape/Screenshots/GIF/ProRaw/Random layout.
+    layout=LAYOUT_DATE adds 'YYYY/YYYY-MM' folders below every bucket.
+    transcode_format ("jpeg" or "avif") adds a final stage that writes a
+    converted copy of every HEIC to transcode_folder, which defaults to
+    '<folder>_Converted' next to the processed folder.
+
+    Set renumber=True to renumber Portrait/Landscape from 001 instead of
+    only naming files that were added since the last run.
+
+    progress_callback, if given, is called as (stage, done, total) after each
+    file operation. cancel_event is a threading.Event checked between file
+    operations; setting it stops the run without leaving a file half-moved.
+    Returns True if the run completed, False otherwise.
+
+    Progress is checkpointed in the folder's cache, so after a crash or
+    cancellation, running again with the same settings resumes at the first
+    unfinished stage instead of starting over.
     """
     root_folder = Path(input_folder_path).resolve()
     logger.info(f"📂 Processing folder: {root_folder}")
 
     if not root_folder.is_dir():
         logger.error(f"❌ Error: The path '{root_folder}' is not a valid directory.")
-        return
+        return False
+
+    if layout not in (LAYOUT_ORIENTATION, LAYOUT_DATE):
+        logger.error(f"❌ Error: Unknown layout '{layout}'.")
+        return False
+
+    if transcode_format and transcode_format not in TRANSCODE_FORMATS:
+        logger.error(f"❌ Error: Unknown transcode format '{transcode_format}'.")
+        return False
+
+    rule_set = None
+    if rules_path:
+        try:
+            rule_set = compile_rules(load_rules(rules_path))
+            logger.info(f"📜 Using classification rules from: {rules_path}")
+        except Exception as e:
+            logger.error(f"❌ Invalid rules file '{rules_path}': {e}")
+            return False
+
+    # Hashes, header metadata and checkpoints from earlier runs
+    cache = open_cache(root_folder)
+    checkpoint = RunCheckpoint(
+        cache,
+        {
+            "portrait_prefix": portrait_prefix,
+            "landscape_prefix": landscape_prefix,
+            "renumber": renumber,
+            "rules_path": str(rules_path) if rules_path else None,
+            "layout": layout,
+            "transcode_format": transcode_format,
+            "transcode_folder": str(transcode_folder) if transcode_folder else None,
+        },
+    )
+    try:
+        # Backup
+        if not checkpoint.is_done(STAGE_BACKUP):
+            backup_folder(root_folder, progress_callback, cancel_event)
+            checkpoint.mark_done(STAGE_BACKUP)
+        check_cancelled(cancel_event)
+
+        if checkpoint.is_done(STAGE_DEDUPE):
+            initial_count = checkpoint.result("initial_count", {})
+            deleted_count = checkpoint.result("deleted_count", {})
+            remaining_count = checkpoint.result("remaining_count", {})
+        else:
+            # Count initial files (kept from the first attempt when resuming)
+            logger.info("📊 Counting initial files...")
+            initial_count = checkpoint.result("initial_count")
+            if initial_count is None:
+                initial_count = count_files(root_folder)
+                checkpoint.mark_done(STAGE_COUNT, initial_count=initial_count)
+
+            # Duplicate Deletion
+            logger.info("🔍 Deleting duplicates...")
+            delete_duplicates(root_folder, progress_callback, cancel_event, cache)
+
+            # Count remaining files after deletion
+            logger.info("📊 Counting remaining files...")
+            remaining_count = count_remaining_files(root_folder)
+            # Taken from the counts rather than from delete_duplicates, whose
+            # tally starts again at zero when an interrupted dedupe resumes
+            deleted_count = {
+                ext: count - remaining_count.get(ext, 0)
+                for ext, count in initial_count.items()
+                if count > remaining_count.get(ext, 0)
+            }
+            checkpoint.mark_done(
+                STAGE_DEDUPE,
+                deleted_count=deleted_count,
+                remaining_count=remaining_count,
+            )
 
-    # Backup
-    backup_folder(root_folder)
-
-    # Count initial files
-    logger.info("📊 Counting initial files...")
-    initial_count = count_files(root_folder)
-
-    # Duplicate Deletion
-    logger.info("🔍 Deleting duplicates...")
-    deleted_count = delete_duplicates(root_folder)
-
-    # Count remaining files after deletion
-    logger.info("📊 Counting remaining files...")
-    remaining_count = count_remaining_files(root_folder)
-
-    # Sorting
-    logger.info("📂 Sorting files...")
-    sort_counts = sort_files(root_folder, portrait_prefix, landscape_prefix)
-
-    # Rename files in Portrait and Landscape folders
-    logger.info("✍️ Renaming files in Portrait and Landscape folders...")
-    for folder_name in [PORTRAIT_FOLDER_NAME, LANDSCAPE_FOLDER_NAME]:
-        target_folder = root_folder / folder_name
-        if target_folder.exists() and target_folder.is_dir():
-            prefix = (
-                portrait_prefix
-                if folder_name == PORTRAIT_FOLDER_NAME
-                else landscape_prefix
+        # Sorting
+        if not checkpoint.is_done(STAGE_SORT):
+            logger.info("📂 Sorting files...")
+            sort_files(
+                root_folder,
+                portrait_prefix,
+                landscape_prefix,
+                progress_callback,
+                cancel_event,
+                rule_set,
+                cache,
+                layout,
+            )
+            checkpoint.mark_done(STAGE_SORT)
+
+        # Rename files in Portrait and Landscape folders
+        if not checkpoint.is_done(STAGE_RENAME):
+            logger.info("✍️ Renaming files in Portrait and Landscape folders...")
+            for folder_name in [PORTRAIT_FOLDER_NAME, LANDSCAPE_FOLDER_NAME]:
+                target_folder = root_folder / folder_name
+                if target_folder.exists() and target_folder.is_dir():
+                    prefix = (
+                        portrait_prefix
+                        if folder_name == PORTRAIT_FOLDER_NAME
+                        else landscape_prefix
+                    )
+                    orientation = "V" if folder_name == PORTRAIT_FOLDER_NAME else "W"
+                    # The date layout numbers each month folder on its own
+                    if layout == LAYOUT_DATE:
+                        rename_targets = sorted(
+                            month
+                            for month in target_folder.glob("*/*")
+                            if month.is_dir()
+                        )
+                    else:
+                        rename_targets = [target_folder]
+                    for rename_target in rename_targets:
+                        rename_files(
+                            rename_target,
+                            prefix,
+                            renumber=renumber,
+                            progress_callback=progress_callback,
+                            cancel_event=cancel_event,
+                            cache=cache,
+                            orientation=orientation,
+                        )
+            checkpoint.mark_done(STAGE_RENAME)
+
+        # Filename Cleaning
+        if not checkpoint.is_done(STAGE_CLEAN):
+            logger.info("🧽 Cleaning filenames...")
+            clean_filenames(root_folder, progress_callback, cancel_event, cache)
+            checkpoint.mark_done(STAGE_CLEAN)
+
+        # Optional HEIC transcoding; converted files are skipped on resume
+        if transcode_format:
+            output_folder = transcode_folder or root_folder.with_name(
+                f"{root_folder.name}_Converted"
+            )
+            logger.info(f"🎞️ Transcoding HEIC files to {transcode_format.upper()}...")
+            transcode_counts = transcode_heic_files(
+                root_folder,
+                output_folder,
+                transcode_format,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                cache=cache,
             )
-            rename_files(target_folder, prefix)
+            logger.info(f"✅ Transcoding complete: {transcode_counts}")
 
-    # Filename Cleaning
-    logger.info("🧽 Cleaning filenames...")
-    clean_filenames(root_folder)
+        checkpoint.finish()
+    except ProcessingCancelled:
+        logger.warning(f"⏹️ Processing cancelled, run again to resume: {root_folder}")
+        return False
+    finally:
+        if cache is not None:
+            cache.close()
 
     # Print Summary Table
     logger.info("📊 Summary Table:")
     print_summary_table(initial_count, deleted_count, remaining_count)
 
     logger.info("\n✅ Processing complete!")
+    return True
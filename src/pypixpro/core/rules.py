@@ -0,0 +1,359 @@
+import fnmatch
+import json
+import re
+import string
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # pragma: no cover
+    try:
+        import tomli as tomllib  # type: ignore
+    except ModuleNotFoundError:
+        tomllib = None
+
+# --- Folder Names ---
+PORTRAIT_FOLDER_NAME = "Portrait"
+LANDSCAPE_FOLDER_NAME = "Landscape"
+GIF_FOLDER_NAME = "GIF"
+RANDOM_FOLDER_NAME = "Random"
+PRORAW_FOLDER_NAME = "ProRaw"
+SCREENSHOTS_FOLDER_NAME = "Screenshots"
+VIDEO_FOLDER_NAME = "Video"
+UNKNOWN_FOLDER_NAME = "Unknown"
+
+# --- Extension Groups ---
+HEIF_EXTENSIONS = (".heic", ".heif")
+IMAGE_EXTENSIONS = (
+    ".jpg",
+    ".jpeg",
+    ".bmp",
+    ".tiff",
+    ".tif",
+    ".psd",
+    ".svg",
+    ".ico",
+    ".jfif",
+    ".pjpeg",
+    ".pjp",
+    ".avif",
+    ".apng",
+)
+SCREENSHOT_EXTENSIONS = (".png",)
+ANIMATED_EXTENSIONS = (".gif", ".webp")
+VIDEO_EXTENSIONS = (".mov", ".mp4", ".m4v", ".3gp")
+RAW_EXTENSIONS = (
+    ".dng",
+    ".raw",
+    ".nef",
+    ".cr2",
+    ".cr3",
+    ".arw",
+    ".orf",
+    ".rw2",
+    ".raf",
+    ".srw",
+    ".kdc",
+)
+
+# The built-in layout, written the same way a rules file would be.
+# "{orientation}" in a folder resolves to Portrait or Landscape.
+DEFAULT_RULES = [
+    {
+        "name": "Photos",
+        "extensions": list(HEIF_EXTENSIONS + IMAGE_EXTENSIONS),
+        "folder": "{orientation}",
+    },
+    {
+        "name": "Screenshots",
+        "extensions": list(SCREENSHOT_EXTENSIONS),
+        "folder": SCREENSHOTS_FOLDER_NAME,
+    },
+    {
+        "name": "GIF",
+        "extensions": list(ANIMATED_EXTENSIONS),
+        "folder": GIF_FOLDER_NAME,
+    },
+    {
+        "name": "Videos",
+        "extensions": list(VIDEO_EXTENSIONS),
+        "folder": f"{VIDEO_FOLDER_NAME}/{{orientation}}",
+    },
+    {
+        "name": "ProRaw",
+        "extensions": list(RAW_EXTENSIONS),
+        "folder": PRORAW_FOLDER_NAME,
+    },
+    {"name": "Misc", "folder": RANDOM_FOLDER_NAME},
+]
+
+# Condition keys that can only be answered by reading the file header
+HEADER_CONDITIONS = {
+    "orientation",
+    "min_width",
+    "max_width",
+    "min_height",
+    "max_height",
+    "min_megapixels",
+    "min_aspect_ratio",
+    "max_aspect_ratio",
+    "camera_make",
+    "camera_model",
+    "software",
+}
+RULE_KEYS = {"name", "folder", "extensions"} | HEADER_CONDITIONS
+
+# Placeholders a folder template can use: the metadata keys plus orientation
+TEMPLATE_FIELDS = {
+    "extension",
+    "width",
+    "height",
+    "megapixels",
+    "aspect_ratio",
+    "camera_make",
+    "camera_model",
+    "software",
+    "captured_at",
+    "orientation",
+}
+
+CompiledRule = namedtuple("CompiledRule", "name folder predicate")
+
+
+class RuleSet:
+    """
+    Classification rules compiled into an extension dispatch table.
+
+    Each extension maps to the ordered rules that can match it and to
+    whether any of them needs header metadata, so a file's header is read
+    at most once and only when a rule actually looks at it.
+    """
+
+    def __init__(self, dispatch, fallback):
+        self.dispatch = dispatch
+        self.fallback = fallback
+
+    def candidates(self, suffix):
+        """Return (rules, needs_header) for a lowercase file suffix."""
+        return self.dispatch.get(suffix, self.fallback)
+
+    def needs_header(self, suffix):
+        """Check whether classifying this suffix needs header metadata."""
+        return self.candidates(suffix)[1]
+
+    def classify(self, metadata):
+        """Return (rule_name, folder) for the first matching rule, or None."""
+        rules, _ = self.candidates(metadata["extension"])
+        for rule in rules:
+            if rule.predicate(metadata):
+                return rule.name, resolve_folder(rule.folder, metadata)
+        return None
+
+
+def orientation_of(metadata):
+    """Return Portrait or Landscape from the metadata's dimensions."""
+    if metadata["height"] > metadata["width"]:
+        return PORTRAIT_FOLDER_NAME
+    return LANDSCAPE_FOLDER_NAME
+
+
+def safe_folder_name(value):
+    """
+    Turn a metadata value into one folder name that stays where it is put.
+
+    Path separators and control characters are replaced and '..' removed,
+    so an EXIF Model of '../../x' cannot climb out of the library; a value
+    with nothing left becomes Unknown.
+    """
+    name = re.sub(r"[/\\\x00-\x1f\x7f]", "_", value).replace("..", "")
+    return name.strip(" .") or UNKNOWN_FOLDER_NAME
+
+
+class _FolderFormatter(string.Formatter):
+    """Formats metadata values as single, safe folder names."""
+
+    def format_field(self, value, format_spec):
+        if value is None:
+            return UNKNOWN_FOLDER_NAME
+        return safe_folder_name(super().format_field(value, format_spec))
+
+
+_FOLDER_FORMATTER = _FolderFormatter()
+
+
+def resolve_folder(template, metadata):
+    """Fill the placeholders of a rule's folder template from metadata."""
+    if "{" not in template:
+        return template
+    values = dict(metadata)
+    if _has_dimensions(metadata):
+        values["orientation"] = orientation_of(metadata)
+    return _FOLDER_FORMATTER.format(template, **values)
+
+
+def load_rules(rules_path):
+    """Load a list of rules from a TOML or JSON rules file."""
+    rules_path = Path(rules_path)
+    if rules_path.suffix.lower() == ".toml":
+        if tomllib is None:
+            raise ValueError("TOML rules files need Python 3.11+ or tomli")
+        with rules_path.open("rb") as fp:
+            data = tomllib.load(fp)
+    else:
+        with rules_path.open("r", encoding="utf-8") as fp:
+            data = json.load(fp)
+
+    rules = data.get("rules") if isinstance(data, dict) else data
+    if not isinstance(rules, list):
+        raise ValueError(f"{rules_path.name}: expected a list of [[rules]]")
+    return rules
+
+
+def _bound_check(bound, metadata_key, is_min):
+    def check(metadata):
+        value = metadata.get(metadata_key)
+        if value is None:
+            return False
+        return value >= bound if is_min else value <= bound
+
+    return check
+
+
+def _glob_check(metadata_key, pattern):
+    pattern = pattern.lower()
+
+    def check(metadata):
+        value = metadata.get(metadata_key)
+        return value is not None and fnmatch.fnmatchcase(value.lower(), pattern)
+
+    return check
+
+
+def _has_dimensions(metadata):
+    return bool(metadata.get("width") and metadata.get("height"))
+
+
+def _orientation_check(expected):
+    expected = expected.capitalize()
+    if expected not in (PORTRAIT_FOLDER_NAME, LANDSCAPE_FOLDER_NAME):
+        raise ValueError(f"orientation must be portrait or landscape: {expected}")
+
+    def check(metadata):
+        return _has_dimensions(metadata) and orientation_of(metadata) == expected
+
+    return check
+
+
+def _compile_predicate(rule):
+    """Build a single predicate that ANDs every condition in a rule."""
+    checks = []
+    for key, value in rule.items():
+        if key in ("name", "folder", "extensions"):
+            continue
+        if key == "orientation":
+            checks.append(_orientation_check(value))
+        elif key in ("camera_make", "camera_model", "software"):
+            checks.append(_glob_check(key, value))
+        else:
+            # min_width -> ("min", "width"), max_aspect_ratio -> ("max", ...)
+            bound_type, metadata_key = key.split("_", 1)
+            checks.append(_bound_check(value, metadata_key, bound_type == "min"))
+
+    # A folder sorted by orientation can only be resolved with dimensions
+    if "{orientation}" in rule["folder"]:
+        checks.append(_has_dimensions)
+
+    if not checks:
+        return lambda metadata: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda metadata: all(check(metadata) for check in checks)
+
+
+def _check_folder(name, folder):
+    """Reject folder templates that cannot be resolved inside the library."""
+    if not isinstance(folder, str) or not folder.strip():
+        raise ValueError(f"{name}: 'folder' must be a non-empty string")
+    parts = folder.replace("\\", "/").split("/")
+    if folder.startswith(("/", "\\")) or ".." in parts:
+        raise ValueError(f"{name}: 'folder' must stay inside the library")
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(folder)]
+    except ValueError as e:
+        raise ValueError(f"{name}: bad 'folder' template: {e}") from e
+    for field in fields:
+        if field is not None and field not in TEMPLATE_FIELDS:
+            raise ValueError(f"{name}: unknown placeholder {{{field}}} in 'folder'")
+
+
+def _check_conditions(name, rule):
+    """Reject condition values of the wrong type before any file is sorted."""
+    for key, value in rule.items():
+        if key.startswith(("min_", "max_")):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name}: '{key}' must be a number, got {value!r}")
+        elif key in ("camera_make", "camera_model", "software", "orientation"):
+            if not isinstance(value, str):
+                raise ValueError(f"{name}: '{key}' must be a string, got {value!r}")
+
+
+def compile_rules(rules):
+    """Validate rules and compile them into a RuleSet."""
+    compiled = []
+    for index, rule in enumerate(rules, 1):
+        name = rule.get("name", f"rule {index}")
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"{name}: unknown keys {sorted(unknown)}")
+        if "folder" not in rule:
+            raise ValueError(f"{name}: missing 'folder'")
+        _check_folder(name, rule["folder"])
+        _check_conditions(name, rule)
+
+        extensions = rule.get("extensions")
+        if extensions is not None:
+            extensions = {
+                ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+                for ext in extensions
+            }
+        needs_header = bool(HEADER_CONDITIONS & set(rule)) or "{" in rule["folder"]
+        compiled.append(
+            (
+                CompiledRule(name, rule["folder"], _compile_predicate(rule)),
+                extensions,
+                needs_header,
+            )
+        )
+
+    all_extensions = set()
+    for _, extensions, _ in compiled:
+        all_extensions |= extensions or set()
+
+    # Every known extension gets its own ordered candidate list; anything
+    # else only sees the rules without an extension filter.
+    dispatch = {}
+    for ext in all_extensions:
+        matching = [
+            (rule, needs_header)
+            for rule, extensions, needs_header in compiled
+            if extensions is None or ext in extensions
+        ]
+        dispatch[ext] = (
+            tuple(rule for rule, _ in matching),
+            any(needs_header for _, needs_header in matching),
+        )
+
+    generic = [
+        (rule, needs_header)
+        for rule, extensions, needs_header in compiled
+        if extensions is None
+    ]
+    fallback = (
+        tuple(rule for rule, _ in generic),
+        any(needs_header for _, needs_header in generic),
+    )
+    return RuleSet(dispatch, fallback)
+
+
+DEFAULT_RULE_SET = compile_rules(DEFAULT_RULES)
@@ -0,0 +1,450 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path, PurePosixPath
+
+import blake3
+
+from .common import (
+    check_cancelled,
+    ensure_inside,
+    hash_file,
+    report_progress,
+    scan_inventory,
+)
+from .processor import (
+    LAYOUT_DATE,
+    LAYOUT_ORIENTATION,
+    RENAMEABLE_EXTENSIONS,
+    classify_file,
+    clean_name,
+    gather_metadata,
+    open_cache,
+    parse_sequence_number,
+    sequence_name,
+)
+from .rules import (
+    DEFAULT_RULE_SET,
+    LANDSCAPE_FOLDER_NAME,
+    PORTRAIT_FOLDER_NAME,
+    compile_rules,
+    load_rules,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# How files are split between shards
+PARTITION_PATH = "path"  # each node only hashes its own files
+PARTITION_DIGEST = "digest"  # duplicates always land in the same shard
+
+
+def shard_of(key, shard_count):
+    """Map a hash (raw bytes) onto a shard index."""
+    return int.from_bytes(key[:8], "big") % shard_count
+
+
+def plan_shard(
+    root_folder,
+    shard_index,
+    shard_count,
+    manifest_path,
+    partition=PARTITION_PATH,
+    rules_path=None,
+    layout=LAYOUT_ORIENTATION,
+    progress_callback=None,
+    cancel_event=None,
+):
+    """
+    Hash, probe and classify one shard of a library into a manifest.
+
+    Nothing in the library is changed. The manifest is a JSON Lines file: a
+    header line describing the shard, including a content hash of the rules
+    file, then one entry per file with its path relative to the library,
+    digest, metadata and planned folder.
+    Returns the number of entries written.
+    """
+    root_folder = Path(root_folder).resolve()
+    manifest_path = Path(manifest_path)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard {shard_index} is outside 0..{shard_count - 1}")
+    if partition not in (PARTITION_PATH, PARTITION_DIGEST):
+        raise ValueError(f"unknown partition '{partition}'")
+    rule_set = DEFAULT_RULE_SET
+    rules_digest = None
+    if rules_path:
+        rule_set = compile_rules(load_rules(rules_path))
+        # Recorded so merge can tell shards planned with other rules apart
+        rules_digest = blake3.blake3(Path(rules_path).read_bytes()).hexdigest()
+
+    header = {
+        "version": MANIFEST_VERSION,
+        "root": str(root_folder),
+        "shard": shard_index,
+        "shard_count": shard_count,
+        "partition": partition,
+        "layout": layout,
+        "rules": rules_digest,
+    }
+    inventory = scan_inventory(root_folder)
+    written = 0
+
+    # Write next to the target and rename at the end, so an interrupted node
+    # never leaves a manifest that looks complete
+    partial_path = manifest_path.with_name(manifest_path.name + ".partial")
+    with partial_path.open("w", encoding="utf-8") as manifest:
+        manifest.write(json.dumps(header) + "\n")
+        for index, path in enumerate(inventory.paths()):
+            check_cancelled(cancel_event)
+            report_progress(progress_callback, "Planning", index + 1, len(inventory))
+            relative_path = path.relative_to(root_folder).as_posix()
+            if partition == PARTITION_PATH:
+                path_hash = blake3.blake3(os.fsencode(relative_path)).digest()
+                if shard_of(path_hash, shard_count) != shard_index:
+                    continue
+
+            try:
+                digest = hash_file(path)
+                if (
+                    partition == PARTITION_DIGEST
+                    and shard_of(digest, shard_count) != shard_index
+                ):
+                    continue
+                metadata = gather_metadata(path, rule_set, layout=layout)
+                match = classify_file(path, metadata, rule_set, layout)
+            except Exception as e:
+                logger.error(f"❌ Error planning {path}: {e}")
+                continue
+
+            rule_name, bucket, folder = match if match else (None, None, None)
+            entry = {
+                "path": relative_path,
+                "digest": digest.hex(),
+                "metadata": metadata,
+                "rule": rule_name,
+                "bucket": bucket,
+                "folder": folder,
+            }
+            manifest.write(json.dumps(entry) + "\n")
+            written += 1
+
+    partial_path.replace(manifest_path)
+    logger.info(
+        f"✅ Shard {shard_index + 1}/{shard_count}: {written} files -> {manifest_path}"
+    )
+    return written
+
+
+def read_manifest(manifest_path):
+    """Return (header, entries) where entries is a generator over the file."""
+    manifest = Path(manifest_path).open("r", encoding="utf-8")
+    header = json.loads(manifest.readline())
+    if header.get("version") != MANIFEST_VERSION:
+        manifest.close()
+        raise ValueError(f"{manifest_path}: unsupported manifest version")
+
+    def entries():
+        with manifest:
+            for line in manifest:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, entries()
+
+
+def _claim_name(occupied, name):
+    """Reserve name (or name-N) in a folder's set of lowercase names."""
+    stem, suffix = PurePosixPath(name).stem, PurePosixPath(name).suffix
+    candidate = name
+    counter = 1
+    while candidate.lower() in occupied:
+        candidate = f"{stem}-{counter}{suffix}"
+        counter += 1
+    occupied.add(candidate.lower())
+    return candidate
+
+
+def _shared(name):
+    """Return one shared copy of a folder or bucket name (or None)."""
+    return sys.intern(name) if name is not None else None
+
+
+def merge_manifests(
+    manifest_paths, portrait_prefix="Portrait", landscape_prefix="Landscape"
+):
+    """
+    Combine shard manifests into one plan of deletes and moves.
+
+    Duplicates are resolved across shards by keeping the copy with the
+    smallest relative path, so the result does not depend on which node
+    saw a file first. Final names, including the incremental
+    '{prefix} V/W NNN' numbering, are chosen here so that no planned move
+    ever targets a name that is present in the library.
+    """
+    headers = []
+    # Entries are streamed; only what naming needs is kept per file, keyed
+    # on the raw digest, with folder and bucket names shared between files
+    survivors = {}  # digest -> (path, folder, bucket)
+    deletes = []  # (path, digest)
+    for manifest_path in manifest_paths:
+        header, entries = read_manifest(manifest_path)
+        headers.append(header)
+        for entry in entries:
+            digest = bytes.fromhex(entry["digest"])
+            path = entry["path"]
+            kept = survivors.get(digest)
+            if kept is None or path < kept[0]:
+                survivors[digest] = (
+                    path,
+                    _shared(entry["folder"]),
+                    _shared(entry["bucket"]),
+                )
+                if kept is not None:
+                    deletes.append((kept[0], digest))
+            else:
+                deletes.append((path, digest))
+
+    if not headers:
+        raise ValueError("no manifests to merge")
+    shard_count = headers[0]["shard_count"]
+    for header in headers:
+        for key in ("shard_count", "partition", "layout", "rules"):
+            if header.get(key) != headers[0].get(key):
+                raise ValueError(f"manifests disagree on {key}")
+    shards = sorted(header["shard"] for header in headers)
+    if shards != list(range(shard_count)):
+        raise ValueError(f"expected shards 0..{shard_count - 1}, got {shards}")
+
+    # Every name currently in a folder stays reserved, so moves never collide
+    occupied = {}
+    for path, _, _ in survivors.values():
+        current = PurePosixPath(path)
+        occupied.setdefault(str(current.parent), set()).add(current.name.lower())
+
+    # Same cleaned prefixes as rename_files, so names survive clean_filenames
+    prefixes = {
+        PORTRAIT_FOLDER_NAME: (
+            clean_name(portrait_prefix) or PORTRAIT_FOLDER_NAME,
+            "V",
+        ),
+        LANDSCAPE_FOLDER_NAME: (
+            clean_name(landscape_prefix) or LANDSCAPE_FOLDER_NAME,
+            "W",
+        ),
+    }
+    used_numbers = {}
+    movers = []
+    # Paths are unique, so the tuples sort by path alone
+    for survivor in sorted(survivors.values()):
+        path, folder, bucket = survivor
+        if folder is None:
+            continue
+        current = PurePosixPath(path)
+        in_place = str(current.parent) == folder
+        sequence = prefixes.get(bucket)
+        if sequence and current.suffix.lower() in RENAMEABLE_EXTENSIONS:
+            number = parse_sequence_number(current.name, *sequence)
+            if in_place and number is not None:
+                used_numbers.setdefault(folder, set()).add(number)
+                continue
+        elif in_place and clean_name(current.name) == current.name:
+            continue
+        movers.append(survivor)
+
+    # Each delete names the copy that stays, so apply can check both first
+    operations = [
+        {
+            "op": "delete",
+            "path": path,
+            "keep": survivors[digest][0],
+            "digest": digest.hex(),
+        }
+        for path, digest in sorted(deletes)
+    ]
+    next_numbers = {}
+    for path, folder, bucket in movers:
+        current = PurePosixPath(path)
+        folder_names = occupied.setdefault(folder, set())
+        sequence = prefixes.get(bucket)
+        if sequence and current.suffix.lower() in RENAMEABLE_EXTENSIONS:
+            number = next_numbers.get(folder)
+            if number is None:
+                number = max(used_numbers.get(folder, ()), default=0) + 1
+            name = sequence_name(*sequence, number, current.suffix)
+            while name.lower() in folder_names:
+                number += 1
+                name = sequence_name(*sequence, number, current.suffix)
+            folder_names.add(name.lower())
+            next_numbers[folder] = number + 1
+        else:
+            name = _claim_name(folder_names, clean_name(current.name) or current.name)
+        operations.append(
+            {
+                "op": "move",
+                "source": path,
+                "destination": f"{folder}/{name}",
+            }
+        )
+
+    logger.info(
+        f"✅ Merged {len(headers)} manifests: {len(deletes)} duplicates, "
+        f"{len(movers)} moves"
+    )
+    return {"version": MANIFEST_VERSION, "operations": operations}
+
+
+def _duplicate_still_valid(root_folder, operation, cache):
+    """
+    Check that a planned delete is still safe against the current library.
+
+    Both the duplicate and the copy that stays must exist and still hash to
+    the digest recorded when the plan was made. Unchanged files are checked
+    by size and mtime against the cache; anything else is hashed again.
+    """
+    if "keep" not in operation or "digest" not in operation:
+        return False
+    expected = bytes.fromhex(operation["digest"])
+    for relative_path in (operation["path"], operation["keep"]):
+        path = root_folder / relative_path
+        ensure_inside(root_folder, path)
+        if not path.is_file() or hash_file(path, cache) != expected:
+            return False
+    return True
+
+
+def apply_plan(root_folder, plan, progress_callback=None, cancel_event=None):
+    """
+    Carry out a merged plan against the library on this machine.
+
+    Deletes run before moves. A delete only goes ahead if the duplicate and
+    the copy that stays both still match the planned digest, so a stale
+    plan cannot remove unique data. A move whose source has gone or whose
+    destination already exists is skipped and logged rather than forced.
+    Unlike run_processing, no backup is taken first. Returns a dict with
+    the number of deleted, moved and skipped files.
+    """
+    root_folder = Path(root_folder).resolve()
+    operations = plan["operations"]
+    counts = {"deleted": 0, "moved": 0, "skipped": 0}
+    logger.warning(f"⚠️ Applying plan without a backup of {root_folder}")
+    cache = open_cache(root_folder)
+    try:
+        for done, operation in enumerate(operations, 1):
+            check_cancelled(cancel_event)
+            try:
+                if operation["op"] == "delete":
+                    path = root_folder / operation["path"]
+                    if not _duplicate_still_valid(root_folder, operation, cache):
+                        counts["skipped"] += 1
+                        logger.warning(
+                            "⚠️ Skipped delete, files changed since planning: "
+                            f"{operation['path']}"
+                        )
+                    else:
+                        path.unlink()
+                        if cache is not None:
+                            cache.forget(path)
+                        counts["deleted"] += 1
+                        logger.info(f"✅ Deleted duplicate: {path}")
+                else:
+                    source = root_folder / operation["source"]
+                    destination = root_folder / operation["destination"]
+                    ensure_inside(root_folder, source)
+                    ensure_inside(root_folder, destination)
+                    if destination.exists() or not source.exists():
+                        counts["skipped"] += 1
+                        logger.warning(f"⚠️ Skipped move: {operation['source']}")
+                    else:
+                        destination.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.move(str(source), destination)
+                        if cache is not None:
+                            cache.move(source, destination)
+                        counts["moved"] += 1
+                        logger.info(
+                            f"✅ Moved: '{operation['source']}' to "
+                            f"'{operation['destination']}'"
+                        )
+            except Exception as e:
+                counts["skipped"] += 1
+                logger.error(f"❌ Error applying {operation}: {e}")
+            report_progress(progress_callback, "Applying", done, len(operations))
+    finally:
+        if cache is not None:
+            cache.close()
+    return counts
+
+
+# --- Command Line ---
+
+
+def main(argv=None):
+    """Run one of the plan / merge / apply steps from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m pypixpro.core.shard",
+        description="Process one library across several machines.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="write the manifest for one shard")
+    plan.add_argument("root")
+    plan.add_argument("--shard", type=int, required=True)
+    plan.add_argument("--shards", type=int, required=True)
+    plan.add_argument("--manifest", required=True)
+    plan.add_argument(
+        "--partition",
+        choices=[PARTITION_PATH, PARTITION_DIGEST],
+        default=PARTITION_PATH,
+    )
+    plan.add_argument("--rules")
+    plan.add_argument(
+        "--layout",
+        choices=[LAYOUT_ORIENTATION, LAYOUT_DATE],
+        default=LAYOUT_ORIENTATION,
+    )
+
+    merge = commands.add_parser("merge", help="merge manifests into a plan")
+    merge.add_argument("manifests", nargs="+")
+    merge.add_argument("--plan", required=True)
+    merge.add_argument("--portrait-prefix", default="Portrait")
+    merge.add_argument("--landscape-prefix", default="Landscape")
+
+    apply = commands.add_parser("apply", help="apply a merged plan")
+    apply.add_argument("root")
+    apply.add_argument("plan")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        if args.command == "plan":
+            plan_shard(
+                args.root,
+                args.shard,
+                args.shards,
+                args.manifest,
+                partition=args.partition,
+                rules_path=args.rules,
+                layout=args.layout,
+            )
+        elif args.command == "merge":
+            merged = merge_manifests(
+                args.manifests, args.portrait_prefix, args.landscape_prefix
+            )
+            with open(args.plan, "w", encoding="utf-8") as fp:
+                json.dump(merged, fp, indent=1)
+        else:
+            with open(args.plan, "r", encoding="utf-8") as fp:
+                counts = apply_plan(args.root, json.load(fp))
+            logger.info(f"✅ Plan applied: {counts}")
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pillow_heif
+from PIL import Image
+
+from .common import (
+    check_cancelled,
+    decode_heic,
+    hash_file,
+    report_progress,
+    scan_inventory,
+)
+from .rules import HEIF_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Output formats: Pillow format name and file suffix
+TRANSCODE_FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "avif": ("AVIF", ".avif"),
+}
+
+# A 48 MP HEIC decodes to ~145 MB of RGB, and each worker holds one
+# decoded image at a time, so the pool never grows past this many
+MAX_DECODED_IMAGES = 2
+
+DEFAULT_QUALITY = 90
+
+# Modes Pillow can write as JPEG; anything else is converted to RGB first
+JPEG_MODES = ("1", "L", "RGB", "CMYK")
+
+
+def _init_worker(output_format):
+    pillow_heif.register_heif_opener()
+    if output_format == "AVIF" and hasattr(pillow_heif, "register_avif_opener"):
+        # Older Pillow releases can only write AVIF through pillow_heif
+        pillow_heif.register_avif_opener()
+
+
+def _jpeg_compatible(image):
+    """Return image in a JPEG-writable mode, flattening alpha onto white."""
+    if image.mode in JPEG_MODES:
+        return image
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+        flattened.paste(rgba, mask=rgba.getchannel("A"))
+        rgba.close()
+        return flattened
+    return image.convert("RGB")
+
+
+def _transcode_worker(source, destination, output_format, quality):
+    """Decode one HEIC and write it out next to destination, then rename."""
+    partial = destination.with_name(destination.name + ".partial")
+    image, info = decode_heic(source)
+    try:
+        if output_format == "JPEG":
+            converted = _jpeg_compatible(image)
+            if converted is not image:
+                image.close()
+                image = converted
+        save_options = {"quality": quality}
+        if info.get("exif"):
+            save_options["exif"] = info["exif"]
+        if info.get("icc_profile"):
+            save_options["icc_profile"] = info["icc_profile"]
+        image.save(partial, format=output_format, **save_options)
+    except Exception:
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        image.close()
+    os.replace(partial, destination)
+    return destination
+
+
+def transcoded_path(output_folder, digest, transcode_format):
+    """Return the content-addressed output path for a source digest."""
+    _, suffix = TRANSCODE_FORMATS[transcode_format]
+    return output_folder / f"{digest.hex()}{suffix}"
+
+
+def transcode_heic_files(
+    root_folder,
+    output_folder,
+    transcode_format="jpeg",
+    quality=DEFAULT_QUALITY,
+    max_workers=None,
+    max_decoded=MAX_DECODED_IMAGES,
+    progress_callback=None,
+    cancel_event=None,
+    cache=None,
+):
+    """
+    Write a JPEG or AVIF copy of every HEIC/HEIF file in root_folder.
+
+    Files are decoded once in a process pool of at most max_decoded
+    workers, each holding one decoded image at a time, so decoding memory
+    stays bounded however many cores the machine has. EXIF and the
+    ICC profile are carried over. Outputs are named by the source's content
+    hash, so a rerun skips anything already converted without decoding it.
+    Cancelling stops new submissions and lets in-flight files finish.
+    Returns a dict with the number of converted, skipped and failed files.
+    """
+    if transcode_format not in TRANSCODE_FORMATS:
+        raise ValueError(f"unknown transcode format '{transcode_format}'")
+    output_format, _ = TRANSCODE_FORMATS[transcode_format]
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    inventory = scan_inventory(root_folder)
+    sources = [
+        path for path in inventory.paths() if path.suffix.lower() in HEIF_EXTENSIONS
+    ]
+    counts = {"converted": 0, "skipped": 0, "failed": 0}
+    if not sources:
+        return counts
+
+    # Idle workers waiting for a decode slot would only cost memory
+    max_workers = min(max_workers or os.cpu_count() or 1, max(max_decoded, 1))
+    context = multiprocessing.get_context()
+    pending = {}
+    done = 0
+
+    def collect(finished):
+        nonlocal done
+        for future in finished:
+            source = pending.pop(future)
+            try:
+                destination = future.result()
+                counts["converted"] += 1
+                logger.info(f"✅ Transcoded: {source.name} -> {destination.name}")
+            except Exception as e:
+                counts["failed"] += 1
+                logger.error(f"❌ Error transcoding {source}: {e}")
+            done += 1
+            report_progress(progress_callback, "Transcoding", done, len(sources))
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(output_format,),
+    ) as executor:
+        try:
+            for source in sources:
+                check_cancelled(cancel_event)
+                try:
+                    destination = transcoded_path(
+                        output_folder, hash_file(source, cache), transcode_format
+                    )
+                except Exception as e:
+                    counts["failed"] += 1
+                    logger.error(f"❌ Error hashing {source}: {e}")
+                    continue
+
+                if destination.exists():
+                    counts["skipped"] += 1
+                    done += 1
+                    report_progress(
+                        progress_callback, "Transcoding", done, len(sources)
+                    )
+                    continue
+
+                # Keep the submission queue short; paths are cheap but
+                # queued work would otherwise outlive a cancellation
+                while len(pending) >= max_workers * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                future = executor.submit(
+                    _transcode_worker,
+                    source,
+                    destination,
+                    output_format,
+                    quality,
+                )
+                pending[future] = source
+        finally:
+            collect(wait(pending).done)
+
+    return counts
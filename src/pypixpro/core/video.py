@@ -0,0 +1,84 @@
+import math
+import os
+import struct
+from datetime import datetime
+
+from .isobmff import find_box, iter_boxes
+
+# Seconds between the QuickTime/MP4 epoch (1904-01-01) and the Unix epoch
+MAC_EPOCH_OFFSET = 2082844800
+
+
+def _read_creation_time(f, mvhd_start):
+    """Return the movie's creation time as a local ISO string, or None."""
+    f.seek(mvhd_start)
+    version = f.read(4)[0]
+    if version == 1:
+        (created,) = struct.unpack(">Q", f.read(8))
+    else:
+        (created,) = struct.unpack(">I", f.read(4))
+    if created <= MAC_EPOCH_OFFSET:
+        return None
+    return datetime.fromtimestamp(created - MAC_EPOCH_OFFSET).isoformat()
+
+
+def _read_display_size(f, tkhd_start):
+    """Return a track's (width, height) after applying its rotation matrix."""
+    f.seek(tkhd_start)
+    version = f.read(4)[0]
+    # Times, track id and duration are 8 bytes wider in version 1
+    f.seek(32 if version == 1 else 20, os.SEEK_CUR)
+    # reserved(8) layer(2) alternate_group(2) volume(2) reserved(2)
+    f.seek(16, os.SEEK_CUR)
+    values = struct.unpack(">9i2I", f.read(44))
+    matrix_a, matrix_b = values[0], values[1]
+    width, height = values[9] >> 16, values[10] >> 16
+
+    rotation = round(math.degrees(math.atan2(matrix_b, matrix_a))) % 360
+    if rotation in (90, 270):
+        width, height = height, width
+    return width, height
+
+
+def _read_video_track(f, trak_start, trak_end):
+    """Return the display size of a 'trak' if it is a video track."""
+    tkhd = find_box(f, trak_start, trak_end, b"tkhd")
+    mdia = find_box(f, trak_start, trak_end, b"mdia")
+    if tkhd is None or mdia is None:
+        return None
+    hdlr = find_box(f, mdia[0], mdia[1], b"hdlr")
+    if hdlr is None:
+        return None
+    # version/flags(4) pre_defined(4) handler_type(4)
+    f.seek(hdlr[0] + 8)
+    if f.read(4) != b"vide":
+        return None
+    return _read_display_size(f, tkhd[0])
+
+
+def read_video_metadata(path):
+    """
+    Read a MOV/MP4 file's display size and creation time from its boxes.
+
+    Only box headers, 'mvhd', 'tkhd' and 'hdlr' are read; the media data
+    is skipped by seeking over it, so this costs a handful of small reads
+    regardless of the video's length. Returns (width, height, captured_at)
+    with captured_at a local ISO string or None.
+    """
+    with open(path, "rb") as f:
+        file_end = f.seek(0, os.SEEK_END)
+        moov = find_box(f, 0, file_end, b"moov")
+        if moov is None:
+            raise ValueError("no 'moov' box")
+
+        captured_at = None
+        size = None
+        for box_type, payload_start, box_end in iter_boxes(f, *moov):
+            if box_type == b"mvhd":
+                captured_at = _read_creation_time(f, payload_start)
+            elif box_type == b"trak" and size is None:
+                size = _read_video_track(f, payload_start, box_end)
+
+    if size is None:
+        raise ValueError("no video track")
+    return size[0], size[1], captured_at
@@ -1,6 +1,8 @@
+import itertools
 import logging
 import sys
 import os
+import threading
 from pathlib import Path
 
 from PySide6.QtWidgets import (
@@ -13,8 +15,12 @@ from PySide6.QtWidgets import (
     QStackedWidget,
     QTextEdit,
     QInputDialog,
+    QHBoxLayout,
+    QProgressBar,
+    QPushButton,
+    QScrollArea,
 )
-from PySide6.QtCore import Qt, QObject, Signal, QThread
+from PySide6.QtCore import Qt, QObject, Signal, QRunnable, QThreadPool
 from PySide6.QtGui import QPixmap, QIcon
 
 from ..core.processor import run_processing
@@ -22,6 +28,18 @@ from ..utils import get_resource_path
 
 logger = logging.getLogger(__name__)
 
+# Number of dropped folders processed at the same time
+MAX_CONCURRENT_JOBS = 2
+
+
+def folders_overlap(first, second):
+    """Return True if two folders are the same or one contains the other."""
+    return (
+        first == second
+        or first.is_relative_to(second)
+        or second.is_relative_to(first)
+    )
+
 
 class SignaledLogHandler(logging.Handler, QObject):
     log_signal = Signal(str)
@@ -35,24 +53,86 @@ class SignaledLogHandler(logging.Handler, QObject):
         self.log_signal.emit(msg)
 
 
-class WorkerThread(QThread):
-    finished_signal = Signal()
+class JobSignals(QObject):
+    progress_signal = Signal(int, str, int, int)
+    finished_signal = Signal(int, bool)
 
-    def __init__(self, folder_path, portrait_prefix, landscape_prefix):
+
+class ProcessingJob(QRunnable):
+    """Run one folder through run_processing on the window's thread pool."""
+
+    def __init__(self, job_id, folder_path, portrait_prefix, landscape_prefix):
         super().__init__()
+        self.job_id = job_id
         self.folder_path = folder_path
         self.portrait_prefix = portrait_prefix
         self.landscape_prefix = landscape_prefix
+        self.cancel_event = threading.Event()
+        self.signals = JobSignals()
+
+    def report_progress(self, stage, done, total):
+        self.signals.progress_signal.emit(self.job_id, stage, done, total)
 
     def run(self):
+        completed = False
         try:
-            run_processing(
-                self.folder_path, self.portrait_prefix, self.landscape_prefix
-            )
+            if not self.cancel_event.is_set():
+                completed = run_processing(
+                    self.folder_path,
+                    self.portrait_prefix,
+                    self.landscape_prefix,
+                    progress_callback=self.report_progress,
+                    cancel_event=self.cancel_event,
+                )
         except Exception as e:
             logging.error(f"Critical error in processing: {e}")
         finally:
-            self.finished_signal.emit()
+            self.signals.finished_signal.emit(self.job_id, bool(completed))
+
+
+class JobWidget(QWidget):
+    """A row showing one job's folder, current stage and progress."""
+
+    def __init__(self, folder_path, cancel_callback):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 4, 8, 4)
+
+        header = QHBoxLayout()
+        self.folder_name = folder_path.name
+        self.status_label = QLabel(f"{self.folder_name} — Queued")
+        header.addWidget(self.status_label, 1)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(cancel_callback)
+        header.addWidget(self.cancel_button)
+        layout.addLayout(header)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+
+    def set_progress(self, stage, done, total):
+        self.status_label.setText(f"{self.folder_name} — {stage}")
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def set_cancelling(self):
+        self.status_label.setText(f"{self.folder_name} — Cancelling...")
+        self.cancel_button.setEnabled(False)
+
+    def set_finished(self, completed, cancelled):
+        if completed:
+            status = "Done"
+        elif cancelled:
+            status = "Cancelled"
+        else:
+            status = "Failed"
+        self.status_label.setText(f"{self.folder_name} — {status}")
+        self.cancel_button.setEnabled(False)
+        if completed:
+            self.progress_bar.setRange(0, 1)
+            self.progress_bar.setValue(1)
 
 
 class DragDropWindow(QMainWindow):
@@ -77,6 +157,12 @@ class DragDropWindow(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.main_layout.addWidget(self.stacked_widget)
 
+        # Job queue
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(MAX_CONCURRENT_JOBS)
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+
         # Setup views
         self.setup_window_image()
         self.setup_summary_display()
@@ -133,6 +219,22 @@ class DragDropWindow(QMainWindow):
             self.stacked_widget.addWidget(self.image_widget)
 
     def setup_summary_display(self):
+        self.processing_widget = QWidget()
+        processing_layout = QVBoxLayout(self.processing_widget)
+        processing_layout.setContentsMargins(0, 0, 0, 0)
+        processing_layout.setSpacing(0)
+
+        # Per-job progress rows
+        job_list = QWidget()
+        self.jobs_layout = QVBoxLayout(job_list)
+        self.jobs_layout.setContentsMargins(0, 0, 0, 0)
+        self.jobs_layout.addStretch(1)
+        job_scroll = QScrollArea()
+        job_scroll.setWidgetResizable(True)
+        job_scroll.setFixedHeight(140)
+        job_scroll.setWidget(job_list)
+        processing_layout.addWidget(job_scroll)
+
         self.summary_widget = QTextEdit()
         self.summary_widget.setReadOnly(True)
         self.summary_widget.setStyleSheet(
@@ -147,7 +249,8 @@ class DragDropWindow(QMainWindow):
             }
         """
         )
-        self.stacked_widget.addWidget(self.summary_widget)
+        processing_layout.addWidget(self.summary_widget)
+        self.stacked_widget.addWidget(self.processing_widget)
 
     def append_log(self, message):
         self.summary_widget.append(message)
@@ -156,7 +259,8 @@ class DragDropWindow(QMainWindow):
         scrollbar.setValue(scrollbar.maximum())
 
     def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls() and not self.is_processing:
+        # Drops are accepted while processing; new folders join the queue
+        if event.mimeData().hasUrls():
             event.acceptProposedAction()
 
     def dropEvent(self, event):
@@ -164,12 +268,38 @@ class DragDropWindow(QMainWindow):
         if not mime.hasUrls():
             return
 
-        dropped_path = Path(mime.urls()[0].toLocalFile())
-        if not dropped_path.exists() or not dropped_path.is_dir():
-            QMessageBox.warning(self, "Error", "Please drop a valid folder.")
+        # Jobs on overlapping trees would hash, move and rename the same files
+        queued_folders = [job.folder_path for job, _ in self.jobs.values()]
+        dropped_paths = []
+        rejected_paths = []
+        for url in mime.urls():
+            dropped_path = Path(url.toLocalFile())
+            if not dropped_path.exists() or not dropped_path.is_dir():
+                continue
+            dropped_path = dropped_path.resolve()
+            if any(
+                folders_overlap(dropped_path, folder)
+                for folder in queued_folders + dropped_paths
+            ):
+                logger.warning(f"⚠️ Already queued: {dropped_path}")
+                rejected_paths.append(dropped_path)
+                continue
+            dropped_paths.append(dropped_path)
+
+        if rejected_paths:
+            QMessageBox.information(
+                self,
+                "Already Queued",
+                "These folders are already queued, or contain or are inside "
+                "a queued folder:\n\n"
+                + "\n".join(str(path) for path in rejected_paths),
+            )
+        if not dropped_paths:
+            if not rejected_paths:
+                QMessageBox.warning(self, "Error", "Please drop a valid folder.")
             return
 
-        # Ask for prefixes
+        # Ask for prefixes once for every folder in this drop
         portrait_prefix, ok1 = QInputDialog.getText(
             self, "Configuration", "Enter Portrait Prefix:", text="Portrait"
         )
@@ -183,29 +313,50 @@ class DragDropWindow(QMainWindow):
             return
 
         # Switch to log view
-        self.stacked_widget.setCurrentWidget(self.summary_widget)
-        self.summary_widget.clear()
+        if not self.is_processing:
+            self.stacked_widget.setCurrentWidget(self.processing_widget)
+            self.summary_widget.clear()
         self.is_processing = True
-        self.setAcceptDrops(False)
 
-        # Start processing in background thread
-        self.worker = WorkerThread(dropped_path, portrait_prefix, landscape_prefix)
-        self.worker.finished_signal.connect(self.on_processing_finished)
-        self.worker.start()
+        for dropped_path in dropped_paths:
+            self.enqueue_job(dropped_path, portrait_prefix, landscape_prefix)
+
+    def enqueue_job(self, folder_path, portrait_prefix, landscape_prefix):
+        job_id = next(self.job_ids)
+        job = ProcessingJob(job_id, folder_path, portrait_prefix, landscape_prefix)
+        widget = JobWidget(folder_path, lambda: self.cancel_job(job_id))
+        self.jobs_layout.insertWidget(self.jobs_layout.count() - 1, widget)
+
+        job.signals.progress_signal.connect(self.on_job_progress)
+        job.signals.finished_signal.connect(self.on_job_finished)
+        self.jobs[job_id] = (job, widget)
+        self.thread_pool.start(job)
+
+    def cancel_job(self, job_id):
+        job, widget = self.jobs[job_id]
+        job.cancel_event.set()
+        widget.set_cancelling()
+
+    def on_job_progress(self, job_id, stage, done, total):
+        if job_id in self.jobs:
+            self.jobs[job_id][1].set_progress(stage, done, total)
+
+    def on_job_finished(self, job_id, completed):
+        job, widget = self.jobs.pop(job_id)
+        widget.set_finished(completed, job.cancel_event.is_set())
+        if not self.jobs:
+            self.on_processing_finished()
 
     def on_processing_finished(self):
         self.is_processing = False
-        self.setAcceptDrops(True)
-        QMessageBox.information(self, "Complete", "Processing finished successfully!")
+        QMessageBox.information(self, "Complete", "All queued folders finished.")
         # Optionally switch back to image or keep logs
         # self.stacked_widget.setCurrentWidget(self.image_widget)
 
     def closeEvent(self, event):
-        # Clean up
-        try:
-            if hasattr(self, "worker") and self.worker.isRunning():
-                self.worker.terminate()
-                self.worker.wait()
-        except:
-            pass
+        # Ask running jobs to stop at the next file boundary and wait for them
+        for job, _ in list(self.jobs.values()):
+            job.signals.finished_signal.disconnect(self.on_job_finished)
+            job.cancel_event.set()
+        self.thread_pool.waitForDone()
         event.accept()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import logging
+import multiprocessing
 import os
 import sys
 from pathlib import Path
@@ -105,4 +106,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for the transcoding process pool in frozen app bundles
+    multiprocessing.freeze_support()
     main()